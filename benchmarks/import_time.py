@@ -0,0 +1,98 @@
+"""Import cost of each CLI subcommand, measured with ``python -X importtime``.
+
+Each command's imports are read from its ``cmd_*`` function in main.py and
+replayed in a fresh interpreter, so the numbers cover exactly what running
+that subcommand would load. Usage:
+
+    python benchmarks/import_time.py                      # table
+    python benchmarks/import_time.py --out before.json    # save for later
+    python benchmarks/import_time.py --baseline before.json
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def command_imports() -> Dict[str, List[str]]:
+    """Map subcommand name -> import statements from its handler's body."""
+    import main
+
+    tree = ast.parse((ROOT / "main.py").read_text(encoding="utf-8"))
+    stmts: Dict[str, List[str]] = {}
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name.startswith("cmd_"):
+            stmts[node.name] = [ast.unparse(n) for n in ast.walk(node) if isinstance(n, (ast.Import, ast.ImportFrom))]
+    parser = main.build_parser()
+    sub = next(a for a in parser._actions if isinstance(a, argparse._SubParsersAction))
+    return {name: stmts.get(p.get_default("func").__name__, []) for name, p in sub.choices.items()}
+
+
+def _parse_importtime(stderr: str) -> Tuple[float, List[Tuple[str, float]]]:
+    # "import time: self [us] | cumulative | imported package"; top-level rows have no indent.
+    top: List[Tuple[str, float]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not name.startswith(" ") or name[1] == " ":
+            continue
+        top.append((name.strip(), int(cumulative) / 1000.0))
+    return sum(ms for _, ms in top), top
+
+
+def measure(statements: List[str], repeat: int) -> Dict[str, Any]:
+    code = "\n".join(["import main", *statements])
+    best: Optional[Dict[str, Any]] = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                              capture_output=True, text=True)
+        total, top = _parse_importtime(proc.stderr)
+        result: Dict[str, Any] = {
+            "ms": round(total, 2),
+            "heaviest": [[n, round(ms, 2)] for n, ms in sorted(top, key=lambda t: -t[1])[:5]],
+        }
+        if proc.returncode != 0:
+            result["error"] = proc.stderr.strip().splitlines()[-1]
+        if best is None or result["ms"] < best["ms"]:
+            best = result
+    return best or {}
+
+
+def run() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("commands", nargs="*", help="Subcommands to measure (default: all)")
+    p.add_argument("--repeat", type=int, default=3, help="Runs per command; the fastest is kept")
+    p.add_argument("--out", help="Write results as JSON")
+    p.add_argument("--baseline", help="JSON from an earlier --out run to compare against")
+    args = p.parse_args()
+
+    imports = command_imports()
+    names = args.commands or sorted(imports)
+    results = {"python": sys.version.split()[0], "commands": {}}
+    results["commands"]["(startup)"] = measure([], args.repeat)
+    for name in names:
+        results["commands"][name] = measure(imports[name], args.repeat)
+
+    baseline = json.loads(Path(args.baseline).read_text())["commands"] if args.baseline else {}
+    for name, r in results["commands"].items():
+        delta = ""
+        if name in baseline:
+            delta = f" ({r['ms'] - baseline[name]['ms']:+.1f})"
+        heaviest = ", ".join(f"{n} {ms:.0f}" for n, ms in r["heaviest"][:3])
+        status = f"  FAILED: {r['error']}" if "error" in r else ""
+        print(f"{name:<12} {r['ms']:>9.1f} ms{delta:<10} {heaviest}{status}")
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    run()
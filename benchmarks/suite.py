@@ -0,0 +1,451 @@
+"""Offline benchmarks for the toolkit's hot paths, with JSON results that can be compared across commits.
+
+Every fixture is synthetic and generated in a temp dir (OUTPUT_DIR and
+PROGRESS_DIR point there, so the real cache and progress log are untouched).
+HTTP is stubbed at the requests transport: Facebook, WordPress and
+LanguageTool calls get canned responses after ``--net-latency`` seconds and
+nothing leaves the machine. Usage:
+
+    python benchmarks/suite.py                                # all benchmarks, table
+    python benchmarks/suite.py score memoize --repeat 10      # a subset
+    python benchmarks/suite.py --quick --out HEAD.json        # smaller fixtures, save results
+    python benchmarks/suite.py --baseline main.json           # compare; --fail-over 0.2 exits 1 on >20% regressions
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# (name, description); run order is the order listed here.
+BENCHMARKS: List[Tuple[str, str]] = [
+    ("ocr_prepare", "_prepare_image_for_ocr on generated text images"),
+    ("ocr", "ocr_image cold (Tesseract) and cached"),
+    ("score", "score_quotes over a large quote corpus"),
+    ("render_tile", "create_quote_tile at 1080px"),
+    ("render_cover", "generate_cover at full size"),
+    ("render_tshirt", "generate_tshirt_design at full size"),
+    ("progress_log", "log() with the buffered writer"),
+    ("progress_read", "read_run / tail over a large log"),
+    ("memoize", "memoize memory hit, disk hit and miss"),
+    ("export_pdf", "export_to_pdf on a synthetic manuscript"),
+    ("export_epub", "export_to_epub full and incremental rebuild"),
+    ("grammar", "GrammarChecker over stubbed LanguageTool, cold and cached"),
+    ("campaign", "campaign staged vs pipelined, posting to stubbed APIs"),
+]
+
+SIZES = {
+    "full": {"images": 8, "quotes": 20000, "renders": 6, "records": 50000, "runs": 500, "keys": 2000,
+             "paragraphs": 1500, "chapters": 30, "grammar_paragraphs": 400, "campaign_quotes": 16},
+    "quick": {"images": 3, "quotes": 2000, "renders": 2, "records": 5000, "runs": 50, "keys": 300,
+              "paragraphs": 200, "chapters": 8, "grammar_paragraphs": 60, "campaign_quotes": 6},
+}
+
+
+def _setup_env(tmp: Path) -> None:
+    # Must run before anything under src/ is imported: config reads the environment once.
+    os.environ.update({
+        "OUTPUT_DIR": str(tmp / "output"),
+        "PROGRESS_DIR": str(tmp / "progress"),
+        "FB_PAGE_ACCESS_TOKEN": "bench", "FB_PAGE_ID": "bench",
+        "WP_BASE_URL": "https://wordpress.invalid", "WP_USERNAME": "bench", "WP_APPLICATION_PASSWORD": "bench",
+        "LANGUAGETOOL_API_URL": "https://languagetool.invalid/v2", "GRAMMAR_PROVIDER": "languagetool",
+    })
+
+
+def _stub_network(latency: float) -> Dict[str, int]:
+    """Replace the requests transport with canned JSON responses; returns per-host call counts."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    calls: Dict[str, int] = {}
+
+    def send(self: HTTPAdapter, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        host = requests.utils.urlparse(request.url).hostname or ""
+        calls[host] = calls.get(host, 0) + 1
+        if latency:
+            time.sleep(latency)
+        body: Dict[str, Any] = {"id": calls[host]}
+        if "languagetool" in host:
+            body = {"matches": []}
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = json.dumps(body).encode()
+        resp.headers["Content-Type"] = "application/json"
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    HTTPAdapter.send = send  # type: ignore[method-assign]
+    return calls
+
+
+def timeit(fn: Callable[[], Optional[int]], repeat: int) -> Dict[str, Any]:
+    """Run ``fn`` ``repeat`` times; it returns the number of operations it did (default 1)."""
+    times: List[float] = []
+    ops = 1
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ops = fn() or 1
+        times.append(time.perf_counter() - start)
+    median = statistics.median(times)
+    return {"ops": ops, "median_ms": round(median * 1000, 3), "min_ms": round(min(times) * 1000, 3),
+            "per_op_ms": round(median * 1000 / ops, 4)}
+
+
+def _words(rng: random.Random, n: int) -> str:
+    vocab = ["time", "story", "light", "remarkable", "secret", "heart", "the", "of", "and", "journey", "discover",
+             "mind", "river", "ultimate", "quiet", "essential", "morning", "timeless", "a", "book", "unlock"]
+    return " ".join(rng.choice(vocab) for _ in range(n))
+
+
+def _quotes(n: int, seed: int = 3) -> List[str]:
+    rng = random.Random(seed)
+    return [_words(rng, rng.randint(5, 30)).capitalize() + rng.choice([".", "!", ", always."]) for _ in range(n)]
+
+
+def _manuscript(path: Path, paragraphs: int, chapters: int, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    with path.open("w", encoding="utf-8") as f:
+        for i in range(paragraphs):
+            if i % max(1, paragraphs // chapters) == 0:
+                f.write(f"Chapter {i // max(1, paragraphs // chapters) + 1}\n\n")
+            f.write(_words(rng, rng.randint(40, 160)).capitalize() + ".\n\n")
+
+
+# Benchmarks: each takes (work dir, sizes, repeat) and returns {case: timeit(...) or {"skipped": reason}}.
+
+def bench_ocr_prepare(work: Path, size: Dict[str, int], repeat: int) -> Dict[str, Any]:
+    from PIL import Image, ImageDraw, ImageFont
+
+    from src.ocr.extract import _prepare_image_for_ocr
+
+    rng = random.Random(11)
+    font = ImageFont.load_default(size=28)
+    paths = []
+    for i in range(size["images"]):
+        img = Image.new("RGB", (1600, 1200), (245, 242, 235))
+        draw = ImageDraw.Draw(img)
+        for line in range(30):
+            draw.text((60, 40 + line * 38), _words(rng, 12), fill=(20, 20, 20), font=font)
+        path = work / f"page_{i:02d}.png"
+        img.save(path)
+        paths.append(path)
+
+    def run() -> int:
+        for p in paths:
+            _prepare_image_for_ocr(p)
+        return len(paths)
+
+    return {"prepare": timeit(run, repeat)}
+
+
+def bench_ocr(work: Path, size: Dict[str, int], repeat: int) -> Dict[str, Any]:
+    from src.config import config
+    from src.ocr.extract import ocr_image
+    from src.utils.cache import clear_cache
+
+    if not (config.tesseract_cmd or shutil.which("tesseract")):
+        return {"cold": {"skipped": "tesseract not installed"}, "cached": {"skipped": "tesseract not installed"}}
+    paths = sorted(work.glob("page_*.png")) or []
+    if not paths:
+        bench_ocr_prepare(work, size, 1)
+        paths = sorted(work.glob("page_*.png"))
+
+    def cold() -> int:
+        clear_cache("ocr")
+        for p in paths:
+            ocr_image(p)
+        return len(paths)
+
+    def cached() -> int:
+        for p in paths:
+            ocr_image(p)
+        return len(paths)
+
+    return {"cold": timeit(cold, max(1, repeat // 2)), "cached": timeit(cached, repeat)}
+
+
+def bench_score(work: Path, size: Dict[str, int], repeat: int) -> Dict[str, Any]:
+    from src.algorithms.selection import score_quotes
+
+    quotes = _quotes(size["quotes"])
+
+    def run() -> int:
+        score_quotes(quotes)
+        return len(quotes)
+
+    return {"score_quotes": timeit(run, repeat)}
+
+
+def bench_render_tile(work: Path, size: Dict[str, int], repeat: int) -> Dict[str, Any]:
+    from src.marketing.generator import create_quote_tile
+
+    quotes = _quotes(size["renders"], seed=5)
+
+    def run() -> int:
+        for i, q in enumerate(quotes):
+            create_quote_tile(q, "Bench Author", work / f"tile_{i}.png")
+        return len(quotes)
+
+    return {"tile": timeit(run, repeat)}
+
+
+def bench_render_cover(work: Path, size: Dict[str, int], repeat: int) -> Dict[str, Any]:
+    from src.cover.generate import generate_cover
+
+    quotes = _quotes(size["renders"], seed=6)
+
+    def run() -> int:
+        for i, q in enumerate(quotes):
+            generate_cover("The Benchmark Book", "Bench Author", q, work / f"cover_{i}.png")
+        return len(quotes)
+
+    return {"cover": timeit(run, repeat)}
+
+
+def bench_render_tshirt(work: Path, size: Dict[str, int], repeat: int) -> Dict[str, Any]:
+    from src.cover.generate import generate_tshirt_design
+
+    quotes = _quotes(size["renders"], seed=8)
+
+    def run() -> int:
+        for i, q in enumerate(quotes):
+            generate_tshirt_design(q, work / f"tshirt_{i}.png", title="Bench")
+        return len(quotes)
+
+    return {"tshirt": timeit(run, repeat)}
+
+
+def bench_progress_log(work: Path, size: Dict[str, int], repeat: int) -> Dict[str, Any]:
+    from src.tracking.progress import flush, log
+
+    n = size["records"]
+
+    def run() -> int:
+        for i in range(n):
+            log(f"bench-{i % size['runs']}", "bench", f"step_{i}", "success", "benchmark record", {"i": i})
+        flush()
+        return n
+
+    return {"log": timeit(run, repeat)}
+
+
+def bench_progress_read(work: Path, size: Dict[str, int], repeat: int) -> Dict[str, Any]:
+    from src.tracking.progress import read_run, reindex, tail
+
+    if not any(Path(os.environ["PROGRESS_DIR"]).glob("progress.jsonl*")):
+        bench_progress_log(work, size, 1)
+    reindex()
+    run_ids = [f"bench-{i}" for i in range(0, size["runs"], max(1, size["runs"] // 20))]
+
+    def lookup() -> int:
+        for r in run_ids:
+            read_run(r)
+        return len(run_ids)
+
+    return {
+        "read_run": timeit(lookup, repeat),
+        "tail_100": timeit(lambda: len(tail(100)) and 1, repeat),
+        "tail_filtered": timeit(lambda: len(tail(50, run_id="bench-1")) and 1, repeat),
+    }
+
+
+def bench_memoize(work: Path, size: Dict[str, int], repeat: int) -> Dict[str, Any]:
+    from src.utils.cache import clear_cache, memoize
+
+    n = size["keys"]
+    value = {"text": "x" * 512}
+    clear_cache("bench")
+    memoize("hot", lambda: value, namespace="bench")
+    state = {"round": 0}
+
+    def miss() -> int:
+        state["round"] += 1
+        for i in range(n):
+            memoize(f"miss:{state['round']}:{i}", lambda: value, namespace="bench")
+        return n
+
+    def memory_hit() -> int:
+        for _ in range(n):
+            memoize("hot", lambda: value, namespace="bench")
+        return n
+
+    # n distinct keys read in insertion order overflow the in-process LRU, so every read goes to disk.
+    for i in range(n):
+        memoize(f"disk:{i}", lambda: value, namespace="bench")
+
+    def disk_hit() -> int:
+        for i in range(n):
+            memoize(f"disk:{i}", lambda: value, namespace="bench")
+        return n
+
+    return {"miss": timeit(miss, repeat), "memory_hit": timeit(memory_hit, repeat),
+            "disk_hit": timeit(disk_hit, repeat)}
+
+
+def bench_export_pdf(work: Path, size: Dict[str, int], repeat: int) -> Dict[str, Any]:
+    from src.export.format import export_to_pdf
+
+    src = work / "manuscript.txt"
+    _manuscript(src, size["paragraphs"], size["chapters"])
+    return {"pdf": timeit(lambda: export_to_pdf(src, work / "book.pdf", title="Bench") and 1, repeat)}
+
+
+def bench_export_epub(work: Path, size: Dict[str, int], repeat: int) -> Dict[str, Any]:
+    from src.export.format import export_to_epub
+
+    src = work / "manuscript.txt"
+    _manuscript(src, size["paragraphs"], size["chapters"])
+    out = work / "book.epub"
+
+    def full() -> int:
+        shutil.rmtree(work / "book.epub.build", ignore_errors=True)
+        export_to_epub(src, out, title="Bench")
+        return 1
+
+    def incremental() -> int:
+        # Touch one chapter so exactly one is regenerated.
+        with src.open("a", encoding="utf-8") as f:
+            f.write("One more closing paragraph.\n\n")
+        export_to_epub(src, out, title="Bench")
+        return 1
+
+    return {"full": timeit(full, repeat), "incremental": timeit(incremental, repeat)}
+
+
+def bench_grammar(work: Path, size: Dict[str, int], repeat: int) -> Dict[str, Any]:
+    from src.grammar.check import GrammarChecker
+    from src.utils.cache import clear_cache
+
+    rng = random.Random(13)
+    text = "\n\n".join(_words(rng, rng.randint(30, 120)).capitalize() + "." for _ in range(size["grammar_paragraphs"]))
+    checker = GrammarChecker()
+
+    def cold() -> int:
+        clear_cache("grammar")
+        checker.check(text)
+        return size["grammar_paragraphs"]
+
+    def cached() -> int:
+        checker.check(text)
+        return size["grammar_paragraphs"]
+
+    return {"cold": timeit(cold, repeat), "cached": timeit(cached, repeat)}
+
+
+def bench_campaign(work: Path, size: Dict[str, int], repeat: int) -> Dict[str, Any]:
+    from src.marketing.campaign import CampaignRun, CampaignSpec
+
+    quotes_file = work / "quotes.txt"
+    quotes_file.write_text("\n".join(_quotes(size["campaign_quotes"], seed=21)), encoding="utf-8")
+
+    def run(pipeline: bool) -> Callable[[], int]:
+        def go() -> int:
+            spec = CampaignSpec(title="Bench", author="Bench Author", quotes_file=str(quotes_file),
+                                post_facebook=True, post_wordpress=True, out_dir=str(work / "campaigns"),
+                                pipeline=pipeline)
+            return CampaignRun.create(spec).run().tiles
+        return go
+
+    return {"staged": timeit(run(False), repeat), "pipelined": timeit(run(True), repeat)}
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "")
+    except OSError:
+        return ""
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[Tuple[str, float]]:
+    """``(benchmark.case, relative change in per-op time)`` for cases present in both runs."""
+    changes = []
+    for name, cases in results["benchmarks"].items():
+        for case, r in cases.items():
+            old = baseline.get("benchmarks", {}).get(name, {}).get(case, {})
+            if "per_op_ms" in r and old.get("per_op_ms"):
+                changes.append((f"{name}.{case}", r["per_op_ms"] / old["per_op_ms"] - 1))
+    return changes
+
+
+def run() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("benchmarks", nargs="*", help=f"Subset to run: {', '.join(n for n, _ in BENCHMARKS)}")
+    p.add_argument("--repeat", type=int, default=5, help="Timed runs per case; the median is reported")
+    p.add_argument("--quick", action="store_true", help="Smaller fixtures for a fast smoke run")
+    p.add_argument("--net-latency", type=float, default=0.01, help="Simulated seconds per stubbed HTTP call")
+    p.add_argument("--out", help="Write results as JSON")
+    p.add_argument("--baseline", help="JSON from an earlier --out run to compare against")
+    p.add_argument("--fail-over", type=float, help="Exit 1 if any case is this much slower than the baseline (0.2 = 20%%)")
+    args = p.parse_args()
+
+    names = args.benchmarks or [n for n, _ in BENCHMARKS]
+    unknown = set(names) - {n for n, _ in BENCHMARKS}
+    if unknown:
+        p.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    size = SIZES["quick" if args.quick else "full"]
+
+    tmp = Path(tempfile.mkdtemp(prefix="tovias-bench-"))
+    _setup_env(tmp)
+    calls = _stub_network(args.net_latency)
+    results: Dict[str, Any] = {
+        "meta": {"commit": _git_commit(), "python": sys.version.split()[0], "platform": platform.platform(),
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": args.repeat,
+                 "sizes": size, "net_latency": args.net_latency},
+        "benchmarks": {},
+    }
+    try:
+        work = tmp / "work"
+        work.mkdir()
+        for name in [n for n, _ in BENCHMARKS if n in names]:
+            try:
+                results["benchmarks"][name] = globals()[f"bench_{name}"](work, size, args.repeat)
+            except ImportError as e:
+                results["benchmarks"][name] = {"all": {"skipped": f"missing dependency: {e.name}"}}
+            except Exception as e:
+                results["benchmarks"][name] = {"all": {"error": f"{type(e).__name__}: {e}"}}
+            for case, r in results["benchmarks"][name].items():
+                if "per_op_ms" in r:
+                    print(f"{name + '.' + case:<28} {r['per_op_ms']:>11.3f} ms/op  ({r['ops']} ops, "
+                          f"median {r['median_ms']:.1f} ms)", flush=True)
+                else:
+                    print(f"{name + '.' + case:<28} {r.get('skipped') or r.get('error')}", flush=True)
+        results["meta"]["stubbed_http_calls"] = calls
+    finally:
+        from src.tracking.progress import flush
+
+        flush()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        print(f"\nvs {args.baseline} ({baseline.get('meta', {}).get('commit', '?')}):")
+        changes = compare(results, baseline)
+        for case, change in changes:
+            flag = "  REGRESSION" if args.fail_over is not None and change > args.fail_over else ""
+            print(f"{case:<28} {change * 100:>+7.1f}%{flag}")
+        if args.fail_over is not None and any(c > args.fail_over for _, c in changes):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    run()
@@ -5,25 +5,16 @@ from pathlib import Path
 
 from src.config import ensure_output_dir
 from src.utils.log import setup_logging
-from src.ocr.extract import extract_text_from_images, extract_quotes
-from src.cover.generate import generate_cover, generate_tshirt_design
-from src.publishing.kdp import upload_sync
-from src.marketing.facebook import post_to_facebook
-from src.marketing.instagram import post_to_instagram
-from src.marketing.wordpress import post_to_wordpress
-from src.audio.record import record_microphone
-from src.audio.tts import text_to_speech
-from src.grammar.check import GrammarChecker
-from src.web.app import create_app
-from src.export.format import export_to_pdf, export_to_epub
-from src.marketing.generator import generate_quote_tiles, compose_message
-from src.marketing.details import generate_book_cover_details, generate_tshirt_details
-from src.integrations.brain_runner import ExternalBrain, run_sync
-from src.tracking.progress import generate_run_id, log, summarize_run, tail
-from src.algorithms.selection import score_quotes, compose_variants
+
+
+# Subsystems are imported inside each command so that, e.g., `progress --tail`
+# does not load OpenCV, Playwright or PortAudio. benchmarks/import_time.py
+# measures the per-command cost.
 
 
 def cmd_ocr(args: argparse.Namespace) -> None:
+    from src.ocr.extract import extract_quotes, extract_text_from_images
+
     images_dir = Path(args.images)
     image_paths = sorted([p for p in images_dir.iterdir() if p.suffix.lower() in {".png", ".jpg", ".jpeg"}])
     text = extract_text_from_images(image_paths)
@@ -36,6 +27,8 @@ def cmd_ocr(args: argparse.Namespace) -> None:
 
 
 def cmd_cover(args: argparse.Namespace) -> None:
+    from src.cover.generate import generate_cover
+
     quote = args.quote
     if args.quote_file:
         quote = Path(args.quote_file).read_text(encoding="utf-8").splitlines()[0]
@@ -45,12 +38,16 @@ def cmd_cover(args: argparse.Namespace) -> None:
 
 
 def cmd_tshirt(args: argparse.Namespace) -> None:
+    from src.cover.generate import generate_tshirt_design
+
     out = Path(args.out)
     generate_tshirt_design(text=args.text, out_path=out, title=args.title or None)
     print(f"Saved t-shirt design to {out}")
 
 
 def cmd_details(args: argparse.Namespace) -> None:
+    from src.marketing.details import generate_book_cover_details, generate_tshirt_details
+
     if args.kind == "cover":
         details = generate_book_cover_details(args.title, args.author, args.text)
     else:
@@ -64,22 +61,31 @@ def cmd_details(args: argparse.Namespace) -> None:
 
 
 def cmd_export(args: argparse.Namespace) -> None:
+    from src.export.format import export_to_epub, export_to_pdf
+
     text_file = Path(args.text)
     if args.pdf:
-        export_to_pdf(text_file, Path(args.pdf))
+        export_to_pdf(text_file, Path(args.pdf), title=args.title or "")
         print(f"Wrote PDF to {args.pdf}")
     if args.epub:
-        export_to_epub(text_file, Path(args.epub))
+        export_to_epub(text_file, Path(args.epub), title=args.title or "Book", author=args.author or "Author")
         print(f"Wrote EPUB to {args.epub}")
 
 
 def cmd_kdp(args: argparse.Namespace) -> None:
+    from src.publishing.kdp import upload_sync
+
     ebook = Path(args.ebook) if args.ebook else None
     pdf = Path(args.paperback) if args.paperback else None
     upload_sync(ebook, pdf, args.title)
 
 
 def cmd_post(args: argparse.Namespace) -> None:
+    from src.marketing.facebook import post_to_facebook
+    from src.marketing.instagram import post_to_instagram
+    from src.marketing.wordpress import post_to_wordpress
+    from src.tracking.progress import generate_run_id, log
+
     run_id = generate_run_id("single_post")
     try:
         platform = args.platform.lower()
@@ -103,12 +109,20 @@ def cmd_post(args: argparse.Namespace) -> None:
 
 
 def cmd_record(args: argparse.Namespace) -> None:
+    from src.audio.record import record_microphone
+
     out = Path(args.out)
-    record_microphone(out, seconds=args.seconds)
-    print(f"Saved recording to {out}")
+    if args.seconds is None:
+        print("Recording... press Ctrl-C to stop")
+    stats = record_microphone(out, seconds=args.seconds, sample_rate=args.sample_rate, channels=args.channels)
+    print(f"Saved {stats.seconds:.1f}s recording to {out}")
+    if stats.overruns or stats.dropped_blocks:
+        print(f"Warning: {stats.overruns} input overruns, {stats.dropped_blocks} dropped blocks")
 
 
 def cmd_tts(args: argparse.Namespace) -> None:
+    from src.audio.tts import text_to_speech
+
     text = Path(args.text_file).read_text(encoding="utf-8")
     out = Path(args.out)
     text_to_speech(text, out)
@@ -116,92 +130,169 @@ def cmd_tts(args: argparse.Namespace) -> None:
 
 
 def cmd_grammarly(_: argparse.Namespace) -> None:
+    from src.web.app import create_app
+
     app = create_app()
     app.run(host="127.0.0.1", port=5000, debug=True)
 
 
 def cmd_grammar_check(args: argparse.Namespace) -> None:
+    from src.grammar.check import get_checker
+
     text = Path(args.text_file).read_text(encoding="utf-8")
-    checker = GrammarChecker()
-    result = checker.check(text)
+    result = get_checker().check(text)
     out = Path(args.out)
     out.write_text(result.corrected_text, encoding="utf-8")
-    print(f"Saved corrected text to {out}")
+    print(f"Saved corrected text to {out} ({len(result.matches)} issues, "
+          f"{result.cached}/{result.paragraphs} paragraphs from cache)")
 
 
 def cmd_campaign(args: argparse.Namespace) -> None:
-    run_id = generate_run_id("campaign")
+    from src.marketing.campaign import CampaignRun, CampaignSpec
+
+    if args.resume:
+        try:
+            run = CampaignRun.resume(args.resume, args.out_dir)
+        except FileNotFoundError as e:
+            raise SystemExit(str(e))
+    else:
+        if not (args.images or args.quotes_file):
+            raise SystemExit("Provide --images or --quotes_file (or --resume <run_id>).")
+        run = CampaignRun.create(CampaignSpec(
+            title=args.title or "", author=args.author or "", images=args.images, quotes_file=args.quotes_file,
+            algorithm=args.algorithm, limit=args.limit, post_facebook=args.post_facebook,
+            post_wordpress=args.post_wordpress, out_dir=args.out_dir, pipeline=args.pipeline,
+        ))
+    result = run.run()
+    if result.skipped:
+        print(f"Resumed; restored {', '.join(result.skipped)} from checkpoints")
+    posts = ", ".join(f"{n} {p}" for p, n in result.posts.items())
+    print(f"{result.tiles} tiles" + (f", posts: {posts}" if posts else ""))
+    if result.unconfirmed:
+        print(f"Unconfirmed posts (interrupted mid-request, not retried): {', '.join(result.unconfirmed)}; "
+              f"check the platform, then remove them from post.json to retry")
+    print(f"Campaign assets in {result.run_dir}\nRun ID: {result.run_id}")
+
+
+def cmd_campaign_batch(args: argparse.Namespace) -> None:
+    from src.marketing.campaign_batch import load_manifest, run_batch
+
     try:
-        log(run_id, "campaign", "start", "started", "Campaign started")
-        quotes: list[str] = []
-        if args.images:
-            images_dir = Path(args.images)
-            image_paths = sorted([p for p in images_dir.iterdir() if p.suffix.lower() in {".png", ".jpg", ".jpeg"}])
-            text = extract_text_from_images(image_paths)
-            quotes = extract_quotes(text)
-            log(run_id, "campaign", "ocr", "success", f"Extracted {len(quotes)} quotes")
-        elif args.quotes_file:
-            content = Path(args.quotes_file).read_text(encoding="utf-8")
-            quotes = [q.strip() for q in content.splitlines() if q.strip()]
-            log(run_id, "campaign", "load_quotes", "success", f"Loaded {len(quotes)} quotes from file")
-        if not quotes:
-            log(run_id, "campaign", "no_quotes", "error", "No quotes found")
-            raise SystemExit("No quotes found. Provide --images or --quotes_file.")
-
-        # Algorithmic selection
-        if args.algorithm == "salience":
-            ranked = score_quotes(quotes)
-            quotes = [qs.quote for qs in ranked]
-            log(run_id, "campaign", "rank", "success", "Quotes ranked by salience", {
-                "top_example": ranked[0].details if ranked else {}
-            })
-
-        if args.limit:
-            quotes = quotes[: args.limit]
-            log(run_id, "campaign", "limit", "info", f"Limited to {len(quotes)} quotes")
-
-        out_dir = Path(args.out_dir or ensure_output_dir()) / "campaign"
-        tiles = generate_quote_tiles(quotes, args.author or "", out_dir)
-        log(run_id, "campaign", "tiles", "success", f"Generated {len(tiles)} tiles", {"dir": str(out_dir)})
-
-        for idx, (quote, tile) in enumerate(zip(quotes, tiles), start=1):
-            message = compose_message(args.title or "", args.author or "", quote)
-            if args.post_facebook:
-                post_to_facebook(message, tile)
-                log(run_id, "campaign", f"fb_{idx}", "success", f"Posted {tile.name}")
-            if args.post_wordpress:
-                wp_title = f"{args.title or 'Book'} — Quote"
-                post_to_wordpress(wp_title, message, tile)
-                log(run_id, "campaign", f"wp_{idx}", "success", f"Posted {tile.name}")
-
-        log(run_id, "campaign", "done", "success", "Campaign finished")
-        print(f"Campaign assets in {out_dir}\nRun ID: {run_id}")
-    except Exception as e:
-        log(run_id, "campaign", "error", "error", str(e))
-        raise
+        specs = load_manifest(Path(args.manifest))
+    except ValueError as e:
+        raise SystemExit(str(e))
+    summary = run_batch(specs, book_workers=args.book_workers, render_workers=args.render_workers)
+    for book in summary["books"]:
+        posts = ", ".join(f"{n} {p}" for p, n in book["posts"].items())
+        status = f"error: {book['error']}" if book["error"] else f"{book['tiles']} tiles" + (f", {posts}" if posts else "")
+        print(f"{book['title'] or '(untitled)':<30} {book['run_id']:<28} {book['seconds']:>7.1f}s  {status}")
+    totals = ", ".join(f"{n} {p}" for p, n in summary["posts"].items())
+    print(f"{summary['succeeded']}/{len(summary['books'])} books in {summary['seconds']:.1f}s, "
+          f"{summary['tiles']} tiles" + (f", posts: {totals}" if totals else ""))
+    print(f"Summary: {summary['summary_path']}")
+    if summary["failed"]:
+        raise SystemExit(1)
 
 
 def cmd_brain(args: argparse.Namespace) -> None:
+    from src.integrations.brain_runner import ExternalBrain, run_sync
+
     brain = ExternalBrain(Path(args.path))
     result = run_sync(brain.execute(args.command, {}))
     print(result)
 
 
 def cmd_brain_fb(args: argparse.Namespace) -> None:
+    from src.integrations.brain_runner import ExternalBrain, run_sync
+    from src.marketing.facebook import post_to_facebook
+
     brain = ExternalBrain(Path(args.path))
     post_text = run_sync(brain.social_post("facebook", args.prompt, {}))
     post_to_facebook(post_text, Path(args.image) if args.image else None)
     print("Facebook post created via BusinessBrain and posted.")
 
 
+def cmd_brain_batch(args: argparse.Namespace) -> None:
+    import json
+    from dataclasses import asdict
+
+    from src.integrations.brain_runner import BrainTask, ExternalBrain, run_batch
+
+    prompts = [p.strip() for p in Path(args.prompts_file).read_text(encoding="utf-8").splitlines() if p.strip()]
+    tasks = [BrainTask(p, platform=args.platform or "") for p in prompts]
+    results = run_batch(ExternalBrain(Path(args.path)), tasks, args.concurrency, args.timeout, cache=not args.no_cache)
+    if args.out:
+        with Path(args.out).open("w", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(asdict(r), ensure_ascii=False) + "\n")
+    for i, r in enumerate(results, 1):
+        status = "error: " + r.error if r.error else ("cached" if r.cached else f"{r.seconds:.1f}s")
+        print(f"[{i}] {status}\n{r.text}\n" if not r.error else f"[{i}] {status}\n")
+    failed = sum(bool(r.error) for r in results)
+    print(f"{len(results) - failed}/{len(results)} succeeded, {sum(r.cached for r in results)} from cache")
+
+
+def _print_record(r) -> None:
+    print(f"{r.run_id} | {r.phase}:{r.step} | {r.status} | {r.message}", flush=True)
+
+
 def cmd_progress(args: argparse.Namespace) -> None:
-    if args.run_id:
+    from src.tracking.metrics import format_report
+    from src.tracking.progress import (
+        compact, follow, metrics_from_records, read_run, reindex, rotate, summarize_run, tail,
+    )
+
+    if args.reindex:
+        count = reindex()
+        print(f"Indexed {count} progress records")
+    elif args.rotate or args.compact:
+        if args.rotate:
+            rotate()
+            print("Rotated progress log into a sealed segment")
+        if args.compact:
+            result = compact(args.older_than)
+            print(f"Compacted {result['compacted']} segments, deleted {result['deleted']} expired summaries")
+    elif args.metrics:
+        recs = read_run(args.run_id) if args.run_id else tail(args.tail, phase=args.phase)
+        for line in format_report(metrics_from_records(recs)):
+            print(line)
+    elif args.follow:
+        for r in tail(args.tail, run_id=args.run_id, phase=args.phase, status=args.status):
+            _print_record(r)
+        try:
+            for r in follow(run_id=args.run_id, phase=args.phase, status=args.status):
+                _print_record(r)
+        except KeyboardInterrupt:
+            pass
+    elif args.run_id:
         summary = summarize_run(args.run_id)
         print(summary)
     else:
-        recs = tail(args.tail)
+        recs = tail(args.tail, phase=args.phase, status=args.status)
         for r in recs:
-            print(f"{r.run_id} | {r.phase}:{r.step} | {r.status} | {r.message}")
+            _print_record(r)
+
+
+def cmd_cache(args: argparse.Namespace) -> None:
+    from src.utils.cache import cache_stats, clear_cache, clear_legacy_cache, namespaces, prune_cache
+
+    names = [args.namespace] if args.namespace else namespaces()
+    for name in names:
+        if args.action == "stats":
+            st = cache_stats(name)
+            rate = "n/a" if st["hit_rate"] is None else f"{st['hit_rate']:.1%}"
+            print(f"{name}: {st['entries']} entries, {st['volume'] / 1e6:.1f}/{st['size_limit'] / 1e6:.0f} MB "
+                  f"({st['eviction_policy']}, ttl={st['ttl']}, compress={st['compress']}) | "
+                  f"hits {st['memory_hits']}+{st['disk_hits']} misses {st['misses']} "
+                  f"evictions {st['evictions']} hit rate {rate}")
+        elif args.action == "prune":
+            print(f"{name}: removed {prune_cache(name)} entries")
+        else:
+            print(f"{name}: cleared {clear_cache(name)} entries")
+    if args.action == "clear" and not args.namespace:
+        legacy = clear_legacy_cache()
+        if legacy:
+            print(f"legacy: cleared {legacy} entries")
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -239,6 +330,8 @@ def build_parser() -> argparse.ArgumentParser:
     export.add_argument("--text", required=True)
     export.add_argument("--pdf")
     export.add_argument("--epub")
+    export.add_argument("--title", help="Book title (PDF running header, EPUB metadata)")
+    export.add_argument("--author")
     export.set_defaults(func=cmd_export)
 
     kdp = sub.add_parser("kdp", help="Assist with Amazon KDP uploads")
@@ -256,7 +349,9 @@ def build_parser() -> argparse.ArgumentParser:
 
     record = sub.add_parser("record", help="Record microphone audio")
     record.add_argument("--out", required=True)
-    record.add_argument("--seconds", type=int, default=60)
+    record.add_argument("--seconds", type=float, help="Stop after N seconds (default: record until Ctrl-C)")
+    record.add_argument("--sample_rate", type=int, default=44100)
+    record.add_argument("--channels", type=int, default=1)
     record.set_defaults(func=cmd_record)
 
     tts = sub.add_parser("tts", help="Text to speech")
@@ -275,16 +370,25 @@ def build_parser() -> argparse.ArgumentParser:
     camp = sub.add_parser("campaign", help="Generate quote tiles and optionally post to Facebook/WordPress")
     camp.add_argument("--title")
     camp.add_argument("--author")
-    group = camp.add_mutually_exclusive_group(required=True)
+    group = camp.add_mutually_exclusive_group()
     group.add_argument("--images", help="Directory of images to OCR for quotes")
     group.add_argument("--quotes_file", help="Text file with one quote per line")
+    group.add_argument("--resume", metavar="RUN_ID", help="Continue an interrupted campaign from its checkpoints")
     camp.add_argument("--out_dir", help="Output directory for generated tiles")
     camp.add_argument("--limit", type=int)
     camp.add_argument("--algorithm", choices=["default", "salience"], default="salience")
     camp.add_argument("--post_facebook", action="store_true")
     camp.add_argument("--post_wordpress", action="store_true")
+    camp.add_argument("--pipeline", action="store_true",
+                      help="Overlap OCR, scoring, rendering and posting through bounded queues")
     camp.set_defaults(func=cmd_campaign)
 
+    camp_batch = sub.add_parser("campaign-batch", help="Run campaigns for many books from a JSON/YAML manifest")
+    camp_batch.add_argument("manifest", help="Manifest with a 'books' list (and optional 'defaults')")
+    camp_batch.add_argument("--book_workers", type=int, default=1, help="Books processed at the same time")
+    camp_batch.add_argument("--render_workers", type=int, help="Shared tile render threads (default CAMPAIGN_RENDER_WORKERS)")
+    camp_batch.set_defaults(func=cmd_campaign_batch)
+
     brain = sub.add_parser("brain", help="Run an external BusinessBrain command")
     brain.add_argument("--path", required=True, help="Path to brain Python file, e.g., C:\\Users\\FireLeaf\\Desktop\\Core Brain\\brain")
     brain.add_argument("--command", required=True, help="Natural language command to run")
@@ -296,11 +400,34 @@ def build_parser() -> argparse.ArgumentParser:
     brain_fb.add_argument("--image")
     brain_fb.set_defaults(func=cmd_brain_fb)
 
+    brain_batch = sub.add_parser("brain_batch", help="Run many BusinessBrain prompts concurrently")
+    brain_batch.add_argument("--path", required=True)
+    brain_batch.add_argument("--prompts_file", required=True, help="One prompt per line")
+    brain_batch.add_argument("--platform", help="Wrap each prompt as a social post for this platform")
+    brain_batch.add_argument("--concurrency", type=int, help="Max concurrent calls (default BRAIN_CONCURRENCY)")
+    brain_batch.add_argument("--timeout", type=float, help="Per-call timeout in seconds (default BRAIN_TIMEOUT)")
+    brain_batch.add_argument("--no_cache", action="store_true", help="Ignore cached results")
+    brain_batch.add_argument("--out", help="Write results as JSON lines")
+    brain_batch.set_defaults(func=cmd_brain_batch)
+
     prog = sub.add_parser("progress", help="Show progress logs or a run summary")
-    prog.add_argument("--run_id", help="Run ID to summarize")
+    prog.add_argument("--run_id", help="Run ID to summarize (or to filter on with --follow)")
     prog.add_argument("--tail", type=int, default=50, help="Tail last N records if no run_id provided")
+    prog.add_argument("--follow", action="store_true", help="Stream new records as they are appended")
+    prog.add_argument("--phase", help="Only show records for this phase")
+    prog.add_argument("--status", choices=["started", "success", "error", "info"], help="Only show records with this status")
+    prog.add_argument("--metrics", action="store_true", help="Timing histograms for --run_id or the last --tail records")
+    prog.add_argument("--reindex", action="store_true", help="Rebuild the run_id index from progress.jsonl")
+    prog.add_argument("--rotate", action="store_true", help="Seal the active progress log into a segment now")
+    prog.add_argument("--compact", action="store_true", help="Compact old segments into gzipped per-run summaries")
+    prog.add_argument("--older_than", type=float, help="Compact segments older than N days (default PROGRESS_RETENTION_DAYS)")
     prog.set_defaults(func=cmd_progress)
 
+    cache = sub.add_parser("cache", help="Inspect or maintain the on-disk caches")
+    cache.add_argument("action", choices=["stats", "prune", "clear"])
+    cache.add_argument("--namespace", help="Only this namespace (default: all)")
+    cache.set_defaults(func=cmd_cache)
+
     return p
 
 
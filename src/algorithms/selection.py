@@ -62,12 +62,17 @@ def compute_quote_score(quote: str) -> QuoteScore:
     })
 
 
+def novelty_key(quote: str) -> str:
+    # Quotes sharing their first 8 words count as near-duplicates.
+    return " ".join(_word_list(quote)[:8])
+
+
 def score_quotes(quotes: List[str]) -> List[QuoteScore]:
     scores = [compute_quote_score(q) for q in quotes]
     # Basic novelty: downweight near-duplicates (same starting 8 words)
     seen_starts = set()
     for qs in scores:
-        start = " ".join(_word_list(qs.quote)[:8])
+        start = novelty_key(qs.quote)
         if start in seen_starts:
             qs.score *= 0.7
         else:
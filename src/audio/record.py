@@ -1,14 +1,124 @@
 from __future__ import annotations
 
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Callable, ContextManager, Optional
 
-import sounddevice as sd
+import numpy as np
 import soundfile as sf
 
 
-def record_microphone(out_path: Path, seconds: int = 60, sample_rate: int = 44100) -> Path:
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    audio = sd.rec(int(seconds * sample_rate), samplerate=sample_rate, channels=1, dtype="float32")
-    sd.wait()
-    sf.write(out_path, audio, sample_rate)
-    return out_path
+logger = logging.getLogger(__name__)
+
+StreamFactory = Callable[..., ContextManager[Any]]
+
+
+@dataclass
+class RecordingStats:
+    frames: int = 0
+    sample_rate: int = 0
+    overruns: int = 0  # callbacks where PortAudio reported input overflow
+    dropped_blocks: int = 0  # blocks lost because the writer fell behind and the queue was full
+
+    @property
+    def seconds(self) -> float:
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+
+def sounddevice_stream(**kwargs: Any) -> ContextManager[Any]:
+    # Imported here so the module (and tests with a fake stream) work without PortAudio.
+    import sounddevice as sd
+
+    return sd.InputStream(**kwargs)
+
+
+class StreamRecorder:
+    """Record from an input stream straight to disk.
+
+    The audio callback only copies each block into a bounded queue; a writer
+    thread drains it into a ``soundfile`` writer, so memory stays at
+    ``queue_blocks`` blocks however long the session runs. ``stream_factory``
+    is called with ``sounddevice.InputStream`` keyword arguments and must
+    return a context manager that invokes ``callback(indata, frames, time,
+    status)``; pass a fake to test without a device.
+    """
+
+    def __init__(self, out_path: Path, sample_rate: int = 44100, channels: int = 1, blocksize: int = 2048,
+                 queue_blocks: int = 256, stream_factory: StreamFactory = sounddevice_stream) -> None:
+        self.out_path = out_path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.stream_factory = stream_factory
+        self.stats = RecordingStats(sample_rate=sample_rate)
+        self._queue: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=queue_blocks)
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def _callback(self, indata: np.ndarray, frames: int, time_info: Any, status: Any) -> None:
+        if status and getattr(status, "input_overflow", False):
+            self.stats.overruns += 1
+        try:
+            self._queue.put_nowait(indata.copy())
+        except queue.Full:
+            self.stats.dropped_blocks += 1
+
+    def _write(self, out: sf.SoundFile) -> None:
+        try:
+            while True:
+                block = self._queue.get()
+                if block is None:
+                    return
+                out.write(block)
+                self.stats.frames += len(block)
+        except BaseException as e:  # surface disk errors in record() and stop the stream
+            self._error = e
+            self._stop.set()
+
+    def stop(self) -> None:
+        """Ask a running ``record`` call to finish; safe from any thread or a signal handler."""
+        self._stop.set()
+
+    def record(self, seconds: Optional[float] = None) -> RecordingStats:
+        """Record until ``seconds`` have elapsed, ``stop()`` is called, or Ctrl-C; the file is always closed."""
+        self.out_path.parent.mkdir(parents=True, exist_ok=True)
+        with sf.SoundFile(str(self.out_path), "w", samplerate=self.sample_rate, channels=self.channels) as out:
+            writer = threading.Thread(target=self._write, args=(out,), name="recorder-writer", daemon=True)
+            writer.start()
+            try:
+                with self.stream_factory(samplerate=self.sample_rate, channels=self.channels, dtype="float32",
+                                         blocksize=self.blocksize, callback=self._callback):
+                    deadline = time.monotonic() + seconds if seconds else None
+                    while not self._stop.is_set():
+                        timeout = 0.25 if deadline is None else min(0.25, deadline - time.monotonic())
+                        if timeout <= 0:
+                            break
+                        self._stop.wait(timeout)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                # Everything already queued reaches the file before it is closed.
+                while writer.is_alive():
+                    try:
+                        self._queue.put(None, timeout=0.25)
+                        break
+                    except queue.Full:
+                        continue
+                writer.join()
+        if self._error is not None:
+            raise self._error
+        if self.stats.overruns or self.stats.dropped_blocks:
+            logger.warning("Recording %s: %d input overruns, %d dropped blocks", self.out_path,
+                           self.stats.overruns, self.stats.dropped_blocks)
+        return self.stats
+
+
+def record_microphone(out_path: Path, seconds: Optional[float] = 60, sample_rate: int = 44100,
+                      channels: int = 1, stream_factory: StreamFactory = sounddevice_stream) -> RecordingStats:
+    """Record the default input device to ``out_path``; ``seconds=None`` records until Ctrl-C."""
+    recorder = StreamRecorder(out_path, sample_rate, channels, stream_factory=stream_factory)
+    return recorder.record(seconds)
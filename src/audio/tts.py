@@ -1,24 +1,181 @@
 from __future__ import annotations
 
+import hashlib
+import multiprocessing
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-import pyttsx3
-import soundfile as sf
 import numpy as np
+import soundfile as sf
+
+from src.config import config, ensure_output_dir
+from src.tracking.progress import registry, timed
+from src.utils.cache import file_tags, open_file, put_file
+
+
+BLOCK_FRAMES = 65536
+TARGET_PEAK = 0.95
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+
+
+@dataclass(frozen=True)
+class VoiceSettings:
+    voice: str = ""  # pyttsx3 voice id; empty keeps the engine default
+    rate: int = 0  # words per minute; 0 keeps the engine default
+    volume: float = 1.0
+
+    @property
+    def cache_key(self) -> str:
+        return f"pyttsx3:{self.voice}:{self.rate}:{self.volume}"
+
+
+def split_segments(text: str, max_chars: int = 1000) -> List[str]:
+    """Paragraphs, with long ones regrouped sentence by sentence up to ``max_chars``."""
+    segments: List[str] = []
+    for para in re.split(r"\n\s*\n", text):
+        para = " ".join(para.split())
+        if not para:
+            continue
+        if len(para) <= max_chars:
+            segments.append(para)
+            continue
+        current = ""
+        for sentence in _SENTENCE_END.split(para):
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                segments.append(current)
+                current = ""
+            current = f"{current} {sentence}".strip()
+        if current:
+            segments.append(current)
+    return segments
+
+
+def segment_key(segment: str, settings: VoiceSettings) -> str:
+    return "tts:" + hashlib.sha256(f"{settings.cache_key}\0{segment}".encode("utf-8")).hexdigest()
+
+
+_engine: Any = None
+
 
+def _init_engine(settings: VoiceSettings) -> None:
+    # One engine per worker process; pyttsx3 engines are neither thread-safe nor cheap to create.
+    global _engine
+    import pyttsx3
 
-def text_to_speech(text: str, out_path: Path) -> Path:
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    engine = pyttsx3.init()
-    temp_wav = out_path.with_suffix(".temp.wav")
-    engine.save_to_file(text, str(temp_wav))
-    engine.runAndWait()
-    data, sr = sf.read(temp_wav)
-    peak = max(1e-6, float(np.max(np.abs(data))))
-    data = (data / peak) * 0.95
-    sf.write(out_path, data, sr)
+    _engine = pyttsx3.init()
+    if settings.voice:
+        _engine.setProperty("voice", settings.voice)
+    if settings.rate:
+        _engine.setProperty("rate", settings.rate)
+    _engine.setProperty("volume", settings.volume)
+
+
+def pyttsx3_synthesize(text: str, settings: VoiceSettings, out_wav: Path) -> None:
+    if _engine is None:
+        _init_engine(settings)
+    _engine.save_to_file(text, str(out_wav))
+    _engine.runAndWait()
+
+
+def _peak(path: Path) -> float:
+    peak = 0.0
+    with sf.SoundFile(str(path)) as f:
+        for block in f.blocks(blocksize=BLOCK_FRAMES, dtype="float32"):
+            if len(block):
+                peak = max(peak, float(np.max(np.abs(block))))
+    return peak
+
+
+def _render_segment(synthesize: Callable[[str, VoiceSettings, Path], None], text: str, settings: VoiceSettings,
+                    out_wav: Path) -> Tuple[float, float]:
+    # Runs in a worker process; returns (peak, seconds) so the parent can cache and time it.
+    start = time.perf_counter()
+    synthesize(text, settings, out_wav)
+    return _peak(out_wav), time.perf_counter() - start
+
+
+def _executor(workers: int, settings: VoiceSettings, synthesize: Callable[..., None]) -> Executor:
+    if workers <= 1:
+        return ThreadPoolExecutor(max_workers=1)
+    # spawn: speech drivers hold native state that does not survive fork.
+    ctx = multiprocessing.get_context("spawn")
+    init = (_init_engine, (settings,)) if synthesize is pyttsx3_synthesize else (None, ())
+    return ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=init[0], initargs=init[1])
+
+
+def _synthesize_into_cache(segments: Dict[str, str], settings: VoiceSettings, workers: int,
+                           synthesize: Callable[[str, VoiceSettings, Path], None], work: Path,
+                           keep: bool = False) -> Dict[str, float]:
+    # Renders each key's text to work/<hash>.wav and caches it with its peak as the tag; returns the peaks.
+    peaks: Dict[str, float] = {}
+    with _executor(min(workers, len(segments)), settings, synthesize) as pool:
+        futures = {pool.submit(_render_segment, synthesize, s, settings, work / f"{k[4:]}.wav"): k
+                   for k, s in segments.items()}
+        for fut in as_completed(futures):
+            key = futures[fut]
+            peak, seconds = fut.result()
+            registry.observe("tts", "segment", seconds)
+            put_file(key, work / f"{key[4:]}.wav", namespace="tts", tag=peak)
+            peaks[key] = peak
+            if not keep:
+                (work / f"{key[4:]}.wav").unlink()
+    return peaks
+
+
+@timed("tts", "text_to_speech")
+def text_to_speech(text: str, out_path: Path, settings: Optional[VoiceSettings] = None, workers: Optional[int] = None,
+                   synthesize: Callable[[str, VoiceSettings, Path], None] = pyttsx3_synthesize,
+                   gap_seconds: float = 0.25) -> Path:
+    """Synthesize ``text`` segment by segment and write one peak-normalized file.
+
+    Segments missing from the ``tts`` cache (keyed by text hash and voice
+    settings) are rendered in worker processes; ``synthesize`` must be a
+    module-level function so it can be sent to them. Normalizing and joining
+    read and write ``BLOCK_FRAMES`` at a time, so memory does not depend on
+    the length of the book.
+    """
+    settings = settings or VoiceSettings(config.tts_voice, config.tts_rate)
+    workers = workers or config.tts_workers
+    segments = split_segments(text, config.tts_segment_chars)
+    if not segments:
+        raise ValueError("No text to synthesize")
+    keys = [segment_key(s, settings) for s in segments]
+    # The peak is the audio entry's tag, so a segment counts as cached only while its audio is.
+    peaks: Dict[str, float] = {k: v for k, v in file_tags(keys, namespace="tts").items() if v is not None}
+    work = Path(tempfile.mkdtemp(prefix=".tts-", dir=ensure_output_dir()))
+    out: Optional[sf.SoundFile] = None
     try:
-        temp_wav.unlink(missing_ok=True)
-    except Exception:
-        pass
+        missing = {k: s for k, s in zip(keys, segments) if k not in peaks}
+        if missing:
+            peaks.update(_synthesize_into_cache(missing, settings, workers, synthesize, work))
+
+        gain = TARGET_PEAK / max(1e-6, max(peaks[k] for k in keys))
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        for i, (key, segment) in enumerate(zip(keys, segments)):
+            src = open_file(key, namespace="tts")
+            if src is None:
+                # Evicted since the lookup above (the cache is size-bounded): render it again.
+                _synthesize_into_cache({key: segment}, settings, 1, synthesize, work, keep=True)
+                src = open(work / f"{key[4:]}.wav", "rb")
+            with src, sf.SoundFile(src) as seg:
+                if out is None:
+                    out = sf.SoundFile(str(out_path), "w", samplerate=seg.samplerate, channels=seg.channels)
+                elif (seg.samplerate, seg.channels) != (out.samplerate, out.channels):
+                    raise RuntimeError(f"TTS segment {i} has a different sample format")
+                if i and gap_seconds:
+                    out.write(np.zeros((int(out.samplerate * gap_seconds), out.channels), dtype="float32"))
+                for block in seg.blocks(blocksize=BLOCK_FRAMES, dtype="float32", always_2d=True):
+                    out.write(block * gain)
+            (work / f"{key[4:]}.wav").unlink(missing_ok=True)
+    finally:
+        if out is not None:
+            out.close()
+        shutil.rmtree(work, ignore_errors=True)
     return out_path
+
@@ -13,11 +13,48 @@ class AppConfig:
     environment: str = os.getenv("ENV", "development")
     output_dir: str = os.getenv("OUTPUT_DIR", "output")
 
+    progress_dir: str = os.getenv("PROGRESS_DIR", "")
+    progress_segment_bytes: int = int(os.getenv("PROGRESS_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+    progress_segment_max_age: float = float(os.getenv("PROGRESS_SEGMENT_MAX_AGE", "0"))
+    progress_retention_days: float = float(os.getenv("PROGRESS_RETENTION_DAYS", "30"))
+    progress_summary_retention_days: float = float(os.getenv("PROGRESS_SUMMARY_RETENTION_DAYS", "0"))
+    progress_sync: bool = os.getenv("PROGRESS_SYNC", "").lower() in {"1", "true", "yes"}
+    progress_flush_interval: float = float(os.getenv("PROGRESS_FLUSH_INTERVAL", "0.5"))
+    metrics_flush_interval: float = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+    cache_memory_items: int = int(os.getenv("CACHE_MEMORY_ITEMS", "256"))
+
+    render_workers: int = int(os.getenv("RENDER_WORKERS", "2"))
+    render_max_pending: int = int(os.getenv("RENDER_MAX_PENDING", "16"))
+    render_job_ttl: float = float(os.getenv("RENDER_JOB_TTL", "86400"))  # seconds; 0 keeps job dirs forever
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+    web_warmup: str = os.getenv("WEB_WARMUP", "sync")  # sync | background | off
+    # SSE holds a worker per open designer tab; only enable it under a threaded/async gunicorn worker class.
+    web_job_events: bool = os.getenv("WEB_JOB_EVENTS", "").lower() in {"1", "true", "yes"}
+
     tesseract_cmd: str | None = os.getenv("TESSERACT_CMD")
 
+    tts_voice: str = os.getenv("TTS_VOICE", "")
+    tts_rate: int = int(os.getenv("TTS_RATE", "0"))
+    tts_workers: int = int(os.getenv("TTS_WORKERS", str(min(4, os.cpu_count() or 1))))
+    tts_segment_chars: int = int(os.getenv("TTS_SEGMENT_CHARS", "1000"))
+
     grammarly_client_id: str | None = os.getenv("GRAMMARLY_CLIENT_ID")
     grammar_provider: str = os.getenv("GRAMMAR_PROVIDER", "languagetool")
     languagetool_api_url: str = os.getenv("LANGUAGETOOL_API_URL", "https://api.languagetool.org/v2")
+    grammar_language: str = os.getenv("GRAMMAR_LANGUAGE", "en-US")
+    grammar_workers: int = int(os.getenv("GRAMMAR_WORKERS", "4"))
+    grammar_chunk_chars: int = int(os.getenv("GRAMMAR_CHUNK_CHARS", "6000"))
+
+    http_pool_size: int = int(os.getenv("HTTP_POOL_SIZE", "8"))
+    campaign_render_workers: int = int(os.getenv("CAMPAIGN_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+    campaign_ocr_workers: int = int(os.getenv("CAMPAIGN_OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+    campaign_queue_size: int = int(os.getenv("CAMPAIGN_QUEUE_SIZE", "8"))
+    campaign_rank_window: int = int(os.getenv("CAMPAIGN_RANK_WINDOW", "8"))
+    campaign_sample_interval: float = float(os.getenv("CAMPAIGN_SAMPLE_INTERVAL", "1.0"))
+
+    brain_concurrency: int = int(os.getenv("BRAIN_CONCURRENCY", "4"))
+    brain_timeout: float = float(os.getenv("BRAIN_TIMEOUT", "120"))
 
     kdp_email: str | None = os.getenv("KDP_EMAIL")
     kdp_password: str | None = os.getenv("KDP_PASSWORD")
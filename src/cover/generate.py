@@ -1,13 +1,16 @@
 from __future__ import annotations
 
+import functools
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
 
 import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
+from src.tracking.progress import timed
+
 
 @dataclass
 class CoverTemplate:
@@ -33,13 +36,30 @@ class TShirtTemplate:
     quote_font_path: Optional[str] = None
 
 
+@functools.lru_cache(maxsize=64)
 def _load_font(path: Optional[str], size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
     try:
         if path and Path(path).exists():
             return ImageFont.truetype(path, size=size)
     except Exception:
         pass
-    return ImageFont.load_default()
+    try:
+        # Sized default font (Pillow >= 10.1 with FreeType) so previews scale too.
+        return ImageFont.load_default(size=size)
+    except (TypeError, ImportError, OSError):
+        return ImageFont.load_default()
+
+
+def _text_size(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.ImageFont, spacing: int = 4,
+               stroke_width: int = 0) -> tuple[int, int]:
+    # textsize/multiline_textsize were removed in Pillow 10.
+    left, top, right, bottom = draw.multiline_textbbox((0, 0), text, font=font, spacing=spacing,
+                                                       stroke_width=stroke_width)
+    return right - left, bottom - top
+
+
+def _scaled(value: float, scale: float) -> int:
+    return max(1, round(value * scale))
 
 
 def _wrap_text(text: str, draw: ImageDraw.ImageDraw, font: ImageFont.ImageFont, max_width: int) -> str:
@@ -48,7 +68,7 @@ def _wrap_text(text: str, draw: ImageDraw.ImageDraw, font: ImageFont.ImageFont,
     current: list[str] = []
     for word in words:
         test = " ".join(current + [word])
-        w, _ = draw.textsize(test, font=font)
+        w = draw.textlength(test, font=font)
         if w <= max_width:
             current.append(word)
         else:
@@ -60,69 +80,107 @@ def _wrap_text(text: str, draw: ImageDraw.ImageDraw, font: ImageFont.ImageFont,
     return "\n".join(lines)
 
 
-def generate_cover(title: str, author: str, quote: str, out_path: Path, template: CoverTemplate | None = None) -> Path:
-    template = template or CoverTemplate()
-    canvas = Image.new("RGB", (template.width, template.height), template.background_color)
-    draw = ImageDraw.Draw(canvas)
+@functools.lru_cache(maxsize=8)
+def _cover_background(width: int, height: int, background_color: tuple[int, int, int],
+                      accent_color: tuple[int, int, int], scale: float) -> Image.Image:
+    # The blurred ring only depends on the template, so it is built once per size; callers copy it.
+    canvas = Image.new("RGB", (width, height), background_color)
+    cv_img = np.array(canvas)
+    cv_img = cv2.circle(cv_img, (width // 2, height // 3), width // 2,
+                        tuple(int(c * 0.5) for c in accent_color), thickness=_scaled(4, scale))
+    cv_img = cv2.GaussianBlur(cv_img, (0, 0), sigmaX=7 * scale)
+    return Image.fromarray(cv_img)
 
-    title_font = _load_font(template.title_font_path, 120)
-    author_font = _load_font(template.author_font_path, 64)
-    quote_font = _load_font(template.quote_font_path, 48)
 
-    cv_img = np.array(canvas)
-    cv_img = cv2.circle(cv_img, (template.width // 2, template.height // 3), template.width // 2,
-                        tuple(int(c * 0.5) for c in template.accent_color), thickness=4)
-    cv_img = cv2.GaussianBlur(cv_img, (0, 0), sigmaX=7)
-    canvas = Image.fromarray(cv_img)
+def draw_cover(title: str, author: str, quote: str, template: CoverTemplate | None = None,
+               scale: float = 1.0) -> Image.Image:
+    """Lay out a cover at ``scale`` of the template size; every size and offset scales with it."""
+    template = template or CoverTemplate()
+    width, height = _scaled(template.width, scale), _scaled(template.height, scale)
+    canvas = _cover_background(width, height, template.background_color, template.accent_color, scale).copy()
     draw = ImageDraw.Draw(canvas)
 
-    title_wrapped = _wrap_text(title, draw, title_font, int(template.width * 0.8))
-    w, h = draw.multiline_textsize(title_wrapped, font=title_font, spacing=10)
-    draw.multiline_text(((template.width - w) // 2, int(template.height * 0.12)), title_wrapped,
-                        fill=template.title_color, font=title_font, align="center", spacing=10)
+    title_font = _load_font(template.title_font_path, _scaled(120, scale))
+    author_font = _load_font(template.author_font_path, _scaled(64, scale))
+    quote_font = _load_font(template.quote_font_path, _scaled(48, scale))
+
+    title_spacing = _scaled(10, scale)
+    title_wrapped = _wrap_text(title, draw, title_font, int(width * 0.8))
+    w, h = _text_size(draw, title_wrapped, title_font, spacing=title_spacing)
+    draw.multiline_text(((width - w) // 2, int(height * 0.12)), title_wrapped,
+                        fill=template.title_color, font=title_font, align="center", spacing=title_spacing)
 
     author_text = author
-    w_a, h_a = draw.textsize(author_text, font=author_font)
-    draw.text(((template.width - w_a) // 2, int(template.height * 0.28) + h), author_text,
+    w_a, h_a = _text_size(draw, author_text, author_font)
+    draw.text(((width - w_a) // 2, int(height * 0.28) + h), author_text,
               fill=template.author_color, font=author_font)
 
-    quote_width = int(template.width * 0.75)
+    quote_spacing = _scaled(6, scale)
+    quote_width = int(width * 0.75)
     quote_wrapped = _wrap_text(f"“{quote}”", draw, quote_font, quote_width)
-    w_q, h_q = draw.multiline_textsize(quote_wrapped, font=quote_font, spacing=6)
-    draw.multiline_text(((template.width - w_q) // 2, int(template.height * 0.5)), quote_wrapped,
-                        fill=template.quote_color, font=quote_font, align="center", spacing=6)
+    w_q, h_q = _text_size(draw, quote_wrapped, quote_font, spacing=quote_spacing)
+    draw.multiline_text(((width - w_q) // 2, int(height * 0.5)), quote_wrapped,
+                        fill=template.quote_color, font=quote_font, align="center", spacing=quote_spacing)
+    return canvas
 
+
+@timed("render", "cover")
+def generate_cover(title: str, author: str, quote: str, out_path: Path, template: CoverTemplate | None = None,
+                   scale: float = 1.0) -> Path:
+    canvas = draw_cover(title, author, quote, template, scale)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     canvas.save(out_path)
     return out_path
 
 
-def generate_tshirt_design(text: str, out_path: Path, title: Optional[str] = None, template: TShirtTemplate | None = None) -> Path:
+def draw_tshirt_design(text: str, title: Optional[str] = None, template: TShirtTemplate | None = None,
+                       scale: float = 1.0) -> Image.Image:
     template = template or TShirtTemplate()
-    canvas = Image.new("RGBA", (template.width, template.height), (0, 0, 0, 0))
+    width, height = _scaled(template.width, scale), _scaled(template.height, scale)
+    canvas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
     draw = ImageDraw.Draw(canvas)
 
-    title_font = _load_font(template.title_font_path, 220)
-    quote_font = _load_font(template.quote_font_path, 180)
+    title_font = _load_font(template.title_font_path, _scaled(220, scale))
+    quote_font = _load_font(template.quote_font_path, _scaled(180, scale))
+    stroke = _scaled(6, scale)
 
-    center_x = template.width // 2
-    max_width = int(template.width * 0.8)
+    center_x = width // 2
+    max_width = int(width * 0.8)
 
-    y = int(template.height * 0.2)
+    y = int(height * 0.2)
     if title:
+        title_spacing = _scaled(12, scale)
         title_wrapped = _wrap_text(title, draw, title_font, max_width)
-        w_t, h_t = draw.multiline_textsize(title_wrapped, font=title_font, spacing=12)
+        w_t, h_t = _text_size(draw, title_wrapped, title_font, spacing=title_spacing, stroke_width=stroke)
         draw.multiline_text((center_x - w_t // 2, y), title_wrapped,
-                            font=title_font, fill=template.text_color, spacing=12,
-                            align="center", stroke_width=6, stroke_fill=template.stroke_color)
-        y += h_t + 80
+                            font=title_font, fill=template.text_color, spacing=title_spacing,
+                            align="center", stroke_width=stroke, stroke_fill=template.stroke_color)
+        y += h_t + _scaled(80, scale)
 
+    quote_spacing = _scaled(10, scale)
     quote_wrapped = _wrap_text(text, draw, quote_font, max_width)
-    w_q, h_q = draw.multiline_textsize(quote_wrapped, font=quote_font, spacing=10)
+    w_q, h_q = _text_size(draw, quote_wrapped, quote_font, spacing=quote_spacing, stroke_width=stroke)
     draw.multiline_text((center_x - w_q // 2, y), quote_wrapped,
-                        font=quote_font, fill=template.text_color, spacing=10,
-                        align="center", stroke_width=6, stroke_fill=template.stroke_color)
+                        font=quote_font, fill=template.text_color, spacing=quote_spacing,
+                        align="center", stroke_width=stroke, stroke_fill=template.stroke_color)
+    return canvas
+
 
+@timed("render", "tshirt")
+def generate_tshirt_design(text: str, out_path: Path, title: Optional[str] = None, template: TShirtTemplate | None = None,
+                           scale: float = 1.0) -> Path:
+    canvas = draw_tshirt_design(text, title, template, scale)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     canvas.save(out_path)
     return out_path
+
+
+def warm_up(scales: Iterable[float] = (1.0,)) -> None:
+    """Load default fonts and cover background layers for ``scales`` ahead of the first render."""
+    cover, tshirt = CoverTemplate(), TShirtTemplate()
+    for scale in scales:
+        for path, size in ((cover.title_font_path, 120), (cover.author_font_path, 64), (cover.quote_font_path, 48),
+                           (tshirt.title_font_path, 220), (tshirt.quote_font_path, 180)):
+            _load_font(path, _scaled(size, scale))
+        _cover_background(_scaled(cover.width, scale), _scaled(cover.height, scale),
+                          cover.background_color, cover.accent_color, scale)
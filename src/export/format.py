@@ -1,50 +1,364 @@
 from __future__ import annotations
 
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+import zipfile
+from dataclasses import dataclass
+from html import escape
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from reportlab.lib.pagesizes import LETTER
+from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfgen import canvas
-from EbookLib import epub
 
+from src.tracking.progress import timed
+
+
+logger = logging.getLogger(__name__)
 
-def export_to_pdf(text_file: Path, out_pdf: Path) -> Path:
-    out_pdf.parent.mkdir(parents=True, exist_ok=True)
-    c = canvas.Canvas(str(out_pdf), pagesize=LETTER)
-    width, height = LETTER
-    margin = 72
-    y = height - margin
 
+@dataclass
+class PdfStyle:
+    pagesize: Tuple[float, float] = LETTER
+    margin: float = 72
+    font_name: str = "Times-Roman"
+    font_size: float = 11
+    leading: float = 15
+    paragraph_spacing: float = 6
+    header_font_name: str = "Helvetica"
+    header_font_size: float = 8
+
+
+def iter_paragraphs(text_file: Path) -> Iterator[str]:
+    """Yield blank-line separated paragraphs one at a time, joining hard-wrapped lines."""
+    lines: List[str] = []
     with open(text_file, "r", encoding="utf-8") as f:
         for line in f:
-            line = line.rstrip("\n")
-            if y < margin:
-                c.showPage()
-                y = height - margin
-            c.drawString(margin, y, line)
-            y -= 14
-    c.save()
+            line = line.strip()
+            if line:
+                lines.append(line)
+            elif lines:
+                yield " ".join(lines)
+                lines = []
+    if lines:
+        yield " ".join(lines)
+
+
+@functools.lru_cache(maxsize=65536)
+def _word_width(word: str, font_name: str, font_size: float) -> float:
+    # Manuscripts reuse a small vocabulary, so most widths come from here.
+    return pdfmetrics.stringWidth(word, font_name, font_size)
+
+
+def wrap_paragraph(text: str, max_width: float, font_name: str, font_size: float) -> Iterator[str]:
+    space = _word_width(" ", font_name, font_size)
+    line: List[str] = []
+    width = 0.0
+    for word in text.split():
+        w = _word_width(word, font_name, font_size)
+        if w > max_width:
+            # Hard-break tokens wider than the column (URLs, long dashes).
+            if line:
+                yield " ".join(line)
+            piece = ""
+            for ch in word:
+                if piece and pdfmetrics.stringWidth(piece + ch, font_name, font_size) > max_width:
+                    yield piece
+                    piece = ""
+                piece += ch
+            line, width = [piece], pdfmetrics.stringWidth(piece, font_name, font_size)
+            continue
+        needed = w if not line else width + space + w
+        if needed <= max_width:
+            line.append(word)
+            width = needed
+        else:
+            yield " ".join(line)
+            line, width = [word], w
+    if line:
+        yield " ".join(line)
+
+
+class PdfTypesetter:
+    """Lay out paragraphs onto pages as they arrive.
+
+    The manuscript is read and wrapped incrementally and only the current
+    page's text object is built at a time, but this is not a streaming
+    writer: ReportLab's canvas keeps every finished page, compressed by
+    ``showPage``, until ``save()``. Memory is therefore O(pages), about
+    6-8 KB per page of dense body text.
+    """
+
+    def __init__(self, out_pdf: Path, title: str = "", style: Optional[PdfStyle] = None) -> None:
+        self.style = style or PdfStyle()
+        self.title = title
+        self.pages = 0
+        self._canvas = canvas.Canvas(str(out_pdf), pagesize=self.style.pagesize, pageCompression=1)
+        self._canvas.setTitle(title)
+        self._text = None
+        self._y = 0.0
+
+    @property
+    def _column_width(self) -> float:
+        return self.style.pagesize[0] - 2 * self.style.margin
+
+    def _start_page(self) -> None:
+        st = self.style
+        self.pages += 1
+        self._y = st.pagesize[1] - st.margin - st.font_size
+        self._text = self._canvas.beginText(st.margin, self._y)
+        self._text.setFont(st.font_name, st.font_size, st.leading)
+
+    def _finish_page(self) -> None:
+        st = self.style
+        width, height = st.pagesize
+        c = self._canvas
+        c.drawText(self._text)
+        c.setFont(st.header_font_name, st.header_font_size)
+        if self.title:
+            c.drawCentredString(width / 2, height - st.margin / 2, self.title)
+        c.drawCentredString(width / 2, st.margin / 2, str(self.pages))
+        c.showPage()
+        self._text = None
+
+    def add_paragraph(self, text: str) -> None:
+        st = self.style
+        first = True
+        for line in wrap_paragraph(text, self._column_width, st.font_name, st.font_size):
+            if self._text is not None and self._y < st.margin:
+                self._finish_page()
+            if self._text is None:
+                self._start_page()
+            elif first:
+                self._text.setTextOrigin(st.margin, self._y)
+            self._text.textLine(line)
+            self._y -= st.leading
+            first = False
+        if self._text is not None:
+            self._y -= st.paragraph_spacing
+
+    def close(self) -> None:
+        if self._text is not None:
+            self._finish_page()
+        self._canvas.save()
+
+
+@timed("export", "pdf")
+def export_to_pdf(text_file: Path, out_pdf: Path, title: str = "", style: Optional[PdfStyle] = None) -> Path:
+    out_pdf.parent.mkdir(parents=True, exist_ok=True)
+    typesetter = PdfTypesetter(out_pdf, title=title, style=style)
+    for paragraph in iter_paragraphs(text_file):
+        typesetter.add_paragraph(paragraph)
+    typesetter.close()
     return out_pdf
 
 
-def export_to_epub(text_file: Path, out_epub: Path, title: str = "Book", author: str = "Author") -> Path:
-    out_epub.parent.mkdir(parents=True, exist_ok=True)
-    book = epub.EpubBook()
-    book.set_identifier("id123456")
-    book.set_title(title)
-    book.set_language("en")
-    book.add_author(author)
+# "# Title", "## Title", "Chapter 3", "Part IV: The Return", "PROLOGUE" on a line of their own. Case
+# matters: the keyword is capitalized, numerals are uppercase and a title after the number starts
+# with a separator or a capital, so prose like "part I loved" or "Part civil war..." is not a heading.
+CHAPTER_RE = re.compile(
+    r"^(?:#{1,2}\s+(?P<md>\S.*)|(?P<word>(?:(?:Chapter|CHAPTER|Part|PART)\s+(?:\d+|[IVXLC]+)\b"
+    r"|Prologue|PROLOGUE|Epilogue|EPILOGUE)(?:\s*[:.\-\u2013\u2014]\s*[^.!?]{0,60}|\s+[A-Z\"'\u201c][^.!?]{0,60})?))$"
+)
+EPUB_BUILD_SUFFIX = ".build"
+# Bump when the chapter XHTML template changes so cached chapters are regenerated.
+EPUB_CHAPTER_VERSION = 1
+
+_CHAPTER_XHTML = """<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="{lang}" xml:lang="{lang}">
+<head><title>{title}</title></head>
+<body>
+<section epub:type="chapter">
+<h1>{title}</h1>
+{body}
+</section>
+</body>
+</html>
+"""
+
+
+@dataclass
+class Chapter:
+    index: int
+    title: str
+    paragraphs: List[str]
+
+    def digest(self, lang: str) -> str:
+        h = hashlib.sha256(f"{EPUB_CHAPTER_VERSION}\0{lang}\0{self.title}".encode("utf-8"))
+        for p in self.paragraphs:
+            h.update(b"\0" + p.encode("utf-8"))
+        return h.hexdigest()
 
+    def to_xhtml(self, lang: str) -> str:
+        body = "\n".join(f"<p>{escape(p)}</p>" for p in self.paragraphs)
+        return _CHAPTER_XHTML.format(lang=lang, title=escape(self.title), body=body)
+
+
+def _heading(line: str, following: Optional[str]) -> Optional[str]:
+    m = CHAPTER_RE.match(line)
+    if m is None:
+        return None
+    if m.group("md"):
+        return m.group("md").strip()
+    # "Chapter 3"-style headings also need a blank line (or the end of the file) after them.
+    return m.group("word").strip() if not following else None
+
+
+def iter_chapters(text_file: Path, default_title: str = "Chapter 1") -> Iterator[Chapter]:
+    """Split a manuscript on heading lines (``# Title``, ``Chapter 3``...), one chapter in memory at a time."""
+    title: Optional[str] = None
+    paragraphs: List[str] = []
+    lines: List[str] = []
+    index = 0
     with open(text_file, "r", encoding="utf-8") as f:
-        content = f.read()
+        stripped = (raw.strip() for raw in f)
+        line = next(stripped, None)
+        while line is not None:
+            following = next(stripped, None)
+            heading = _heading(line, following)
+            if heading is not None or not line:
+                if lines:
+                    paragraphs.append(" ".join(lines))
+                    lines = []
+            else:
+                lines.append(line)
+            if heading is not None:
+                if paragraphs or title is not None:
+                    index += 1
+                    yield Chapter(index, title or default_title, paragraphs)
+                title, paragraphs = heading, []
+            line = following
+    if lines:
+        paragraphs.append(" ".join(lines))
+    if paragraphs or title is not None:
+        yield Chapter(index + 1, title or default_title, paragraphs)
+
 
-    chapter = epub.EpubHtml(title="Chapter 1", file_name="chap_01.xhtml", lang="en")
-    chapter.content = f"<h1>{title}</h1><pre>{content}</pre>"
+def _container_xml() -> str:
+    return ('<?xml version="1.0" encoding="utf-8"?>\n'
+            '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+            "</rootfiles></container>\n")
+
+
+def _content_opf(book_id: str, title: str, author: str, lang: str, chapters: List[Tuple[str, str]]) -> str:
+    modified = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    items = "\n".join(f'<item id="c{i}" href="{name}" media-type="application/xhtml+xml"/>'
+                      for i, (name, _) in enumerate(chapters, start=1))
+    spine = "\n".join(f'<itemref idref="c{i}"/>' for i in range(1, len(chapters) + 1))
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:identifier id="book-id">{book_id}</dc:identifier>
+<dc:title>{escape(title)}</dc:title>
+<dc:creator>{escape(author)}</dc:creator>
+<dc:language>{lang}</dc:language>
+<meta property="dcterms:modified">{modified}</meta>
+</metadata>
+<manifest>
+<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+{items}
+</manifest>
+<spine toc="ncx">
+<itemref idref="nav" linear="no"/>
+{spine}
+</spine>
+</package>
+"""
+
+
+def _nav_xhtml(title: str, lang: str, chapters: List[Tuple[str, str]]) -> str:
+    links = "\n".join(f'<li><a href="{name}">{escape(t)}</a></li>' for name, t in chapters)
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="{lang}" xml:lang="{lang}">
+<head><title>{escape(title)}</title></head>
+<body><nav epub:type="toc" id="toc"><h1>Contents</h1><ol>
+{links}
+</ol></nav></body>
+</html>
+"""
+
+
+def _toc_ncx(book_id: str, title: str, chapters: List[Tuple[str, str]]) -> str:
+    points = "\n".join(
+        f'<navPoint id="np{i}" playOrder="{i}"><navLabel><text>{escape(t)}</text></navLabel>'
+        f'<content src="{name}"/></navPoint>'
+        for i, (name, t) in enumerate(chapters, start=1)
+    )
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+<head><meta name="dtb:uid" content="{book_id}"/></head>
+<docTitle><text>{escape(title)}</text></docTitle>
+<navMap>
+{points}
+</navMap>
+</ncx>
+"""
+
+
+@timed("export", "epub")
+def export_to_epub(text_file: Path, out_epub: Path, title: str = "Book", author: str = "Author",
+                   lang: str = "en") -> Path:
+    """Build a chapter-per-file EPUB 3, regenerating only chapters whose content changed.
+
+    Rendered chapters and a manifest of their content hashes live in
+    ``<out>.epub.build/``; unchanged chapters are reused from there and only
+    the container (OPF, nav, NCX and the zip itself) is rewritten.
+    """
+    out_epub.parent.mkdir(parents=True, exist_ok=True)
+    build = out_epub.with_name(out_epub.name + EPUB_BUILD_SUFFIX)
+    build.mkdir(exist_ok=True)
+    manifest_path = build / "manifest.json"
+    try:
+        previous = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        previous = {}
 
-    book.add_item(chapter)
-    book.toc = (epub.Link("chap_01.xhtml", "Chapter 1", "chap_01"),)
-    book.add_item(epub.EpubNcx())
-    book.add_item(epub.EpubNav())
-    book.spine = ["nav", chapter]
+    manifest: Dict[str, Dict[str, str]] = {}
+    chapters: List[Tuple[str, str]] = []
+    rebuilt = 0
+    for chapter in iter_chapters(text_file, default_title=title):
+        # Named by content, not position, so inserting or removing a chapter leaves the others' files alone.
+        digest = chapter.digest(lang)
+        name, n = f"chap_{digest[:16]}.xhtml", 1
+        while name in manifest:  # identical chapters still need distinct entries
+            n += 1
+            name = f"chap_{digest[:16]}-{n}.xhtml"
+        path = build / name
+        if previous.get(name, {}).get("sha256") != digest or not path.exists():
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_text(chapter.to_xhtml(lang), encoding="utf-8")
+            os.replace(tmp, path)
+            rebuilt += 1
+        manifest[name] = {"sha256": digest, "title": chapter.title}
+        chapters.append((name, chapter.title))
+    for stale in set(previous) - set(manifest):
+        (build / stale).unlink(missing_ok=True)
 
-    epub.write_epub(str(out_epub), book)
+    book_id = f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, f'tovias:{title}:{author}')}"
+    tmp_epub = out_epub.with_name(out_epub.name + ".tmp")
+    with zipfile.ZipFile(tmp_epub, "w", zipfile.ZIP_DEFLATED) as zf:
+        # mimetype must be the first entry and stored uncompressed.
+        zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        zf.writestr("META-INF/container.xml", _container_xml())
+        zf.writestr("OEBPS/content.opf", _content_opf(book_id, title, author, lang, chapters))
+        zf.writestr("OEBPS/nav.xhtml", _nav_xhtml(title, lang, chapters))
+        zf.writestr("OEBPS/toc.ncx", _toc_ncx(book_id, title, chapters))
+        for name, _ in chapters:
+            zf.write(build / name, f"OEBPS/{name}")
+    os.replace(tmp_epub, out_epub)
+    tmp_manifest = manifest_path.with_name(manifest_path.name + ".tmp")
+    tmp_manifest.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_manifest, manifest_path)
+    logger.info("EPUB %s: %d chapters, %d regenerated", out_epub, len(chapters), rebuilt)
     return out_epub
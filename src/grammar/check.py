@@ -1,27 +1,308 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import bisect
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional, Protocol, Tuple
 
-import language_tool_python
+import requests
+from requests.adapters import HTTPAdapter
 
 from src.config import config
+from src.tracking.progress import timed
+from src.utils.cache import get_many, set_many
+
+
+@dataclass
+class GrammarMatch:
+    offset: int  # code points into the text that was checked
+    length: int
+    replacements: List[str]
+    rule_id: str
+    message: str = ""
+    category: str = ""
 
 
 @dataclass
 class GrammarResult:
     corrected_text: str
+    matches: List[GrammarMatch] = field(default_factory=list)
+    paragraphs: int = 0
+    cached: int = 0  # paragraphs whose matches came from the cache
+
+
+class GrammarProvider(Protocol):
+    # Identifies the rule configuration; cached matches are only reused under the same key.
+    cache_key: str
+
+    def check(self, text: str) -> List[GrammarMatch]: ...
+
+
+def _utf16_converter(text: str) -> Callable[[int], int]:
+    # LanguageTool reports Java (UTF-16) offsets; astral characters such as emoji take two units.
+    astral_units = [i + k for k, i in enumerate(i for i, ch in enumerate(text) if ord(ch) > 0xFFFF)]
+    if not astral_units:
+        return lambda u: u
+    return lambda u: u - bisect.bisect_left(astral_units, u)
+
+
+MAX_RETRY_AFTER = 60.0
+
+
+def _retry_after(value: Optional[str], default: float) -> float:
+    # Retry-After is delay-seconds or an HTTP-date (RFC 9110); anything else falls back to our own backoff.
+    if not value:
+        return default
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return default
+    return min(max(0.0, delay), MAX_RETRY_AFTER)
+
+
+class LanguageToolClient:
+    """Minimal LanguageTool HTTP client on one pooled, keep-alive session.
+
+    Point ``LANGUAGETOOL_API_URL`` at a self-hosted server
+    (``http://localhost:8081/v2``) to lift the public API's size and rate limits.
+    """
+
+    def __init__(self, api_url: str, language: str = "en-US", pool_size: int = 4, timeout: float = 60.0,
+                 session: Optional[requests.Session] = None) -> None:
+        self.check_url = api_url.rstrip("/") + "/check"
+        self.language = language
+        self.timeout = timeout
+        self.disabled_rules: List[str] = []
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @property
+    def cache_key(self) -> str:
+        return f"languagetool:{self.check_url}:{self.language}:{','.join(sorted(self.disabled_rules))}"
+
+    def check(self, text: str, retries: int = 3) -> List[GrammarMatch]:
+        data = {"text": text, "language": self.language}
+        if self.disabled_rules:
+            data["disabledRules"] = ",".join(self.disabled_rules)
+        for attempt in range(retries):
+            resp = self.session.post(self.check_url, data=data, timeout=self.timeout)
+            if resp.status_code in (426, 429) and attempt + 1 < retries:
+                # Public API rate limit.
+                time.sleep(_retry_after(resp.headers.get("Retry-After"), 2 ** attempt))
+                continue
+            resp.raise_for_status()
+            break
+        conv = _utf16_converter(text)
+        matches = []
+        for m in resp.json().get("matches", []):
+            start = conv(m["offset"])
+            matches.append(GrammarMatch(
+                offset=start,
+                length=conv(m["offset"] + m["length"]) - start,
+                replacements=[r["value"] for r in m.get("replacements", [])],
+                rule_id=m.get("rule", {}).get("id", ""),
+                message=m.get("message", ""),
+                category=m.get("rule", {}).get("category", {}).get("id", ""),
+            ))
+        return matches
+
+
+class StubProvider:
+    """Offline provider with a few deterministic rules, for tests and local development."""
+
+    cache_key = "stub:1"
+
+    RULES: Tuple[Tuple[str, re.Pattern, Callable[[re.Match], str], str], ...] = (
+        ("WORD_REPEAT", re.compile(r"\b(\w+)\s+\1\b", re.IGNORECASE), lambda m: m.group(1), "Repeated word"),
+        ("DOUBLE_SPACE", re.compile(r"(?<=\S)  +(?=\S)"), lambda m: " ", "Multiple spaces"),
+        ("I_LOWERCASE", re.compile(r"\bi\b"), lambda m: "I", "Capitalize 'I'"),
+        ("SPACE_BEFORE_PUNCT", re.compile(r"(?<=\w) +(?=[,.;:!?])"), lambda m: "", "Space before punctuation"),
+    )
+
+    def check(self, text: str) -> List[GrammarMatch]:
+        matches = [
+            GrammarMatch(m.start(), m.end() - m.start(), [fix(m)], rule_id, message, "STUB")
+            for rule_id, pattern, fix, message in self.RULES
+            for m in pattern.finditer(text)
+        ]
+        return sorted(matches, key=lambda m: m.offset)
+
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+")
+
+
+def split_chunks(text: str, max_chars: int) -> List[Tuple[int, str]]:
+    """Split ``text`` into ``(offset, chunk)`` pieces of at most ``max_chars``, breaking between paragraphs.
+
+    A paragraph longer than ``max_chars`` is broken after its last sentence
+    end (or, failing that, whitespace) that fits.
+    """
+    chunks: List[Tuple[int, str]] = []
+    start = 0
+    while len(text) - start > max_chars:
+        limit = start + max_chars
+        cut = max((m.end() for m in _PARAGRAPH_BREAK.finditer(text, start, limit)), default=0)
+        if not cut:
+            cut = max((m.end() for m in _SENTENCE_END.finditer(text, start, limit)), default=0)
+        if not cut:
+            cut = text.rfind(" ", start, limit) + 1 or limit
+        chunks.append((start, text[start:cut]))
+        start = cut
+    if start < len(text):
+        chunks.append((start, text[start:]))
+    return chunks
+
+
+def split_paragraphs(text: str) -> List[Tuple[int, str]]:
+    """``(offset, paragraph)`` for each non-blank paragraph; the separators themselves are never checked."""
+    out: List[Tuple[int, str]] = []
+    pos = 0
+    for m in _PARAGRAPH_BREAK.finditer(text):
+        out.append((pos, text[pos:m.start()]))
+        pos = m.end()
+    out.append((pos, text[pos:]))
+    return [(o, p) for o, p in out if p.strip()]
+
+
+def apply_corrections(text: str, matches: List[GrammarMatch]) -> str:
+    """Apply each match's first replacement, skipping matches that overlap an earlier one."""
+    out: List[str] = []
+    pos = 0
+    for m in sorted(matches, key=lambda m: m.offset):
+        if not m.replacements or m.offset < pos:
+            continue
+        out.append(text[pos:m.offset])
+        out.append(m.replacements[0])
+        pos = m.offset + m.length
+    out.append(text[pos:])
+    return "".join(out)
+
+
+@dataclass
+class _Chunk:
+    text: str
+    # (start in chunk, length, paragraph index, offset of this piece within its paragraph)
+    pieces: List[Tuple[int, int, int, int]] = field(default_factory=list)
 
 
 class GrammarChecker:
-    def __init__(self) -> None:
+    CHUNK_SEPARATOR = "\n\n"
+
+    def __init__(self, provider: Optional[GrammarProvider] = None, workers: Optional[int] = None,
+                 chunk_chars: Optional[int] = None, cache: bool = True) -> None:
         self.provider = config.grammar_provider.lower()
-        if self.provider not in {"languagetool", "grammarly"}:
+        if self.provider not in {"languagetool", "grammarly", "stub"}:
             self.provider = "languagetool"
+        self.workers = workers or config.grammar_workers
+        self.chunk_chars = chunk_chars or config.grammar_chunk_chars
+        self.cache = cache
+        self._backend = provider
+        if self._backend is None and self.provider == "languagetool":
+            self._backend = LanguageToolClient(config.languagetool_api_url, config.grammar_language,
+                                               pool_size=self.workers)
+        elif self._backend is None and self.provider == "stub":
+            self._backend = StubProvider()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="grammar")
+            return self._executor
+
+    def _cache_key(self, paragraph: str) -> Optional[str]:
+        rules = getattr(self._backend, "cache_key", None)
+        if not self.cache or not rules:
+            return None
+        return "grammar:" + hashlib.sha256(f"{rules}\0{paragraph}".encode("utf-8")).hexdigest()
+
+    def _pack(self, paragraphs: Dict[int, str]) -> List[_Chunk]:
+        # Pack paragraphs (long ones pre-split at sentence ends) into chunks of at most chunk_chars.
+        chunks: List[_Chunk] = []
+        current = _Chunk("")
+        for idx, para in paragraphs.items():
+            for piece_off, piece in split_chunks(para, self.chunk_chars):
+                if current.pieces and len(current.text) + len(self.CHUNK_SEPARATOR) + len(piece) > self.chunk_chars:
+                    chunks.append(current)
+                    current = _Chunk("")
+                if current.pieces:
+                    current.text += self.CHUNK_SEPARATOR
+                current.pieces.append((len(current.text), len(piece), idx, piece_off))
+                current.text += piece
+        if current.pieces:
+            chunks.append(current)
+        return chunks
+
+    @timed("grammar", "chunk")
+    def _check_chunk(self, chunk: _Chunk) -> List[Tuple[int, GrammarMatch]]:
+        """Check one chunk and return ``(paragraph index, match)`` with paragraph-relative offsets."""
+        starts = [p[0] for p in chunk.pieces]
+        out = []
+        for m in self._backend.check(chunk.text):
+            start, length, idx, piece_off = chunk.pieces[max(0, bisect.bisect_right(starts, m.offset) - 1)]
+            if start <= m.offset and m.offset + m.length <= start + length:
+                out.append((idx, replace(m, offset=m.offset - start + piece_off)))
+        return out
+
+    def _paragraph_matches(self, paragraphs: List[str]) -> Tuple[List[List[GrammarMatch]], int]:
+        results: List[Optional[List[GrammarMatch]]] = [None] * len(paragraphs)
+        keys = [self._cache_key(p) for p in paragraphs]
+        cached = get_many([k for k in keys if k], namespace="grammar") if any(keys) else {}
+        for i, key in enumerate(keys):
+            if key in cached:
+                results[i] = cached[key]
+        hits = sum(r is not None for r in results)
+        pending = {i: p for i, p in enumerate(paragraphs) if results[i] is None}
+        if pending:
+            for i in pending:
+                results[i] = []
+            chunks = self._pack(pending)
+            found = self._pool().map(self._check_chunk, chunks) if len(chunks) > 1 else [self._check_chunk(chunks[0])]
+            for pairs in found:
+                for idx, m in pairs:
+                    results[idx].append(m)
+            fresh = {keys[i]: sorted(results[i], key=lambda m: m.offset) for i in pending if keys[i]}
+            if fresh:
+                set_many(fresh, namespace="grammar")
+        return [r or [] for r in results], hits
 
     def check(self, text: str) -> GrammarResult:
-        if self.provider == "languagetool":
-            tool = language_tool_python.LanguageToolPublicAPI("en-US")
-            matches = tool.check(text)
-            corrected = language_tool_python.utils.correct(text, matches)
-            return GrammarResult(corrected_text=corrected)
-        return GrammarResult(corrected_text=text)
+        """Check ``text`` paragraph by paragraph; unchanged paragraphs reuse cached matches.
+
+        Only paragraphs missing from the ``grammar`` cache namespace (keyed by
+        paragraph hash and the provider's rule configuration) are sent, packed
+        into chunks that are checked concurrently. Matches are shifted back to
+        offsets in ``text`` before corrections are applied.
+        """
+        if self._backend is None or not text.strip():
+            return GrammarResult(corrected_text=text)
+        spans = split_paragraphs(text)
+        per_paragraph, hits = self._paragraph_matches([p for _, p in spans])
+        matches = [replace(m, offset=m.offset + off) for (off, _), ms in zip(spans, per_paragraph) for m in ms]
+        return GrammarResult(corrected_text=apply_corrections(text, matches), matches=matches,
+                             paragraphs=len(spans), cached=hits)
+
+
+_checker: Optional[GrammarChecker] = None
+_checker_lock = threading.Lock()
+
+
+def get_checker() -> GrammarChecker:
+    """Process-wide checker, so the HTTP session and thread pool are reused across calls."""
+    global _checker
+    with _checker_lock:
+        if _checker is None:
+            _checker = GrammarChecker()
+        return _checker
@@ -1,9 +1,60 @@
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
+import hashlib
 import importlib.util
+import json
+import threading
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, Optional
-import asyncio
+from typing import Any, Awaitable, Dict, List, Optional, Tuple, TypeVar
+
+from src.config import config
+from src.tracking.progress import registry
+from src.utils.cache import amemoize, get_many
+
+
+T = TypeVar("T")
+
+_modules: Dict[Tuple[str, float], Any] = {}
+_modules_lock = threading.Lock()
+
+
+def _load_module(brain_path: Path) -> Any:
+    # Loaded once per process and file version, so batches and the web app don't re-exec the brain.
+    path = brain_path.resolve()
+    key = (str(path), path.stat().st_mtime)
+    with _modules_lock:
+        if key not in _modules:
+            spec = importlib.util.spec_from_file_location("external_brain", str(path))
+            if spec is None or spec.loader is None:
+                raise RuntimeError(f"Cannot load brain from {brain_path}")
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)  # type: ignore[attr-defined]
+            _modules[key] = module
+        return _modules[key]
+
+
+@dataclass
+class BrainTask:
+    prompt: str
+    platform: str = ""  # set for social_post, empty for a plain execute command
+    context: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def command(self) -> str:
+        return f"Create a {self.platform} post: {self.prompt}" if self.platform else self.prompt
+
+
+@dataclass
+class BrainResult:
+    task: BrainTask
+    text: str = ""
+    error: str = ""
+    cached: bool = False
+    seconds: float = 0.0
 
 
 class ExternalBrain:
@@ -14,12 +65,7 @@ class ExternalBrain:
     def _load(self) -> Any:
         if self._brain is not None:
             return self._brain
-        spec = importlib.util.spec_from_file_location("external_brain", str(self.brain_path))
-        if spec is None or spec.loader is None:
-            raise RuntimeError(f"Cannot load brain from {self.brain_path}")
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)  # type: ignore[attr-defined]
-        brain_cls = getattr(module, "BusinessBrain", None)
+        brain_cls = getattr(_load_module(self.brain_path), "BusinessBrain", None)
         if brain_cls is None:
             raise RuntimeError("BusinessBrain class not found in brain module")
         self._brain = brain_cls()
@@ -33,6 +79,92 @@ class ExternalBrain:
         command = f"Create a {platform} post: {content_prompt}"
         return await self.execute(command, context or {})
 
+    def cache_key(self, task: BrainTask) -> str:
+        payload = json.dumps([str(self.brain_path.resolve()), task.command, task.context], sort_keys=True, default=str)
+        return "brain:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _run_task(self, task: BrainTask, key: Optional[str], sem: asyncio.Semaphore,
+                        timeout: Optional[float]) -> BrainResult:
+        async with sem:
+            start = time.perf_counter()
+            try:
+                if key:
+                    # amemoize also collapses duplicate prompts within the batch into one call.
+                    call = amemoize(key, lambda: self.execute(task.command, task.context), namespace="brain")
+                else:
+                    call = self.execute(task.command, task.context)
+                text = await asyncio.wait_for(call, timeout)
+                result = BrainResult(task, text=text)
+            except asyncio.TimeoutError:
+                result = BrainResult(task, error=f"timed out after {timeout}s")
+            except Exception as e:
+                result = BrainResult(task, error=str(e) or type(e).__name__)
+            result.seconds = time.perf_counter() - start
+            registry.observe("brain", "task", result.seconds, error=bool(result.error))
+            return result
+
+    async def batch(self, tasks: List[BrainTask], concurrency: Optional[int] = None, timeout: Optional[float] = None,
+                    cache: bool = True) -> List[BrainResult]:
+        """Run ``tasks`` concurrently, at most ``concurrency`` at a time; results keep the input order.
+
+        Successful outputs are cached in the ``brain`` namespace by a hash of the
+        brain file, command and context, so repeated prompts are not re-generated.
+        A failing or timed-out task is reported in its result instead of
+        cancelling the rest of the batch.
+        """
+        self._load()
+        keys: List[Optional[str]] = [self.cache_key(t) if cache else None for t in tasks]
+        hits = await asyncio.to_thread(get_many, [k for k in keys if k], "brain") if cache else {}
+        sem = asyncio.Semaphore(concurrency or config.brain_concurrency)
+        timeout = timeout or config.brain_timeout or None
+        results: List[Optional[BrainResult]] = [None] * len(tasks)
+        pending = []
+        for i, (task, key) in enumerate(zip(tasks, keys)):
+            if key in hits:
+                results[i] = BrainResult(task, text=hits[key], cached=True)
+            else:
+                pending.append((i, self._run_task(task, key, sem, timeout)))
+        for (i, _), result in zip(pending, await asyncio.gather(*(c for _, c in pending))):
+            results[i] = result
+        return [r for r in results if r is not None]
+
+
+class BrainLoop:
+    """One long-lived event loop on a daemon thread that every brain call is scheduled on."""
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="brain-loop", daemon=True)
+        self._thread.start()
+
+    def submit(self, coro: Awaitable[T]) -> "concurrent.futures.Future[T]":
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)  # type: ignore[arg-type]
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+
+_loop: Optional[BrainLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> BrainLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = BrainLoop()
+        return _loop
+
+
+def run_sync(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    return get_loop().run(coro, timeout)
+
 
-def run_sync(coro):
-    return asyncio.get_event_loop().run_until_complete(coro)
+def run_batch(brain: ExternalBrain, tasks: List[BrainTask], concurrency: Optional[int] = None,
+              timeout: Optional[float] = None, cache: bool = True) -> List[BrainResult]:
+    return run_sync(brain.batch(tasks, concurrency, timeout, cache))
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from concurrent.futures import Executor, as_completed
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import ensure_output_dir
+from src.tracking.progress import generate_run_id, log, read_run, span
+
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg"}
+
+
+@dataclass
+class CampaignSpec:
+    title: str = ""
+    author: str = ""
+    images: Optional[str] = None
+    quotes_file: Optional[str] = None
+    algorithm: str = "salience"
+    limit: Optional[int] = None
+    post_facebook: bool = False
+    post_wordpress: bool = False
+    out_dir: Optional[str] = None
+    pipeline: bool = False  # overlap the stages through bounded queues (src/marketing/pipeline.py)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CampaignSpec":
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+    @property
+    def platforms(self) -> List[str]:
+        return [p for p, on in (("facebook", self.post_facebook), ("wordpress", self.post_wordpress)) if on]
+
+
+@dataclass
+class CampaignResult:
+    run_id: str
+    run_dir: Path
+    quotes: int = 0
+    tiles: int = 0
+    posts: Dict[str, int] = field(default_factory=dict)  # platform -> posts made so far
+    skipped: List[str] = field(default_factory=list)  # stages restored from checkpoints
+    unconfirmed: List[str] = field(default_factory=list)  # "<idx>:<platform>" posts interrupted mid-request
+
+
+def _write_json(path: Path, data: Any) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def is_pending(entry: Any) -> bool:
+    # In-flight marker written to post.json just before the platform request.
+    return isinstance(entry, dict) and entry.get("pending") is True
+
+
+def _read_json(path: Path) -> Optional[Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class CampaignRun:
+    """A campaign as four checkpointed stages under ``<out_dir>/campaign/<run_id>/``.
+
+    ``spec.json`` holds the arguments; each stage writes ``<stage>.json`` when
+    it completes. Render and post also checkpoint per item (``render.json``
+    lists finished tiles, ``post.json`` the post IDs per quote and platform), so
+    a resumed run never re-renders a finished tile or re-posts a confirmed post.
+    A post is marked pending before its request; if the process dies before
+    the ID is saved, resume reports it as unconfirmed instead of posting again
+    (check the platform, then delete the entry from ``post.json`` to retry).
+    """
+
+    def __init__(self, spec: CampaignSpec, run_id: str, run_dir: Path, render_pool: Optional[Executor] = None) -> None:
+        self.spec = spec
+        self.run_id = run_id
+        self.run_dir = run_dir
+        self.tiles_dir = run_dir / "tiles"
+        # Tiles render on this pool when given (campaign-batch shares one across books), else inline.
+        self.render_pool = render_pool
+
+    @classmethod
+    def create(cls, spec: CampaignSpec, render_pool: Optional[Executor] = None) -> "CampaignRun":
+        root = Path(spec.out_dir or ensure_output_dir()) / "campaign"
+        root.mkdir(parents=True, exist_ok=True)
+        while True:
+            # Run IDs have millisecond resolution; books started together in a batch can collide.
+            run_id = generate_run_id("campaign")
+            run_dir = root / run_id
+            try:
+                run_dir.mkdir()
+                break
+            except FileExistsError:
+                time.sleep(0.001)
+        _write_json(run_dir / "spec.json", asdict(spec))
+        return cls(spec, run_id, run_dir, render_pool)
+
+    @classmethod
+    def resume(cls, run_id: str, out_dir: Optional[str] = None, render_pool: Optional[Executor] = None) -> "CampaignRun":
+        candidates = [Path(out_dir or ensure_output_dir()) / "campaign" / run_id]
+        # The start record remembers where a run with a custom --out_dir lives.
+        candidates += [Path(r.extra["run_dir"]) for r in read_run(run_id)
+                       if r.step == "start" and r.extra.get("run_dir")]
+        for run_dir in candidates:
+            data = _read_json(run_dir / "spec.json")
+            if data is not None:
+                return cls(CampaignSpec.from_dict(data), run_id, run_dir, render_pool)
+        raise FileNotFoundError(f"No campaign checkpoints found for {run_id}")
+
+    def _checkpoint(self, stage: str) -> Optional[Dict[str, Any]]:
+        return _read_json(self.run_dir / f"{stage}.json")
+
+    def _save(self, stage: str, data: Dict[str, Any]) -> None:
+        _write_json(self.run_dir / f"{stage}.json", data)
+
+    def ingest(self) -> List[str]:
+        if self.spec.images:
+            # Only the OCR path needs OpenCV and Tesseract; OCR text is also cached per image hash.
+            from src.ocr.extract import extract_quotes, extract_text_from_images
+
+            images_dir = Path(self.spec.images)
+            image_paths = sorted(p for p in images_dir.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+            with span(self.run_id, "campaign", "ocr") as s:
+                quotes = extract_quotes(extract_text_from_images(image_paths))
+                s.message = f"Extracted {len(quotes)} quotes"
+        elif self.spec.quotes_file:
+            content = Path(self.spec.quotes_file).read_text(encoding="utf-8")
+            quotes = [q.strip() for q in content.splitlines() if q.strip()]
+            log(self.run_id, "campaign", "load_quotes", "success", f"Loaded {len(quotes)} quotes from file")
+        else:
+            quotes = []
+        if not quotes:
+            log(self.run_id, "campaign", "no_quotes", "error", "No quotes found")
+            raise SystemExit("No quotes found. Provide --images or --quotes_file.")
+        return quotes
+
+    def score(self, quotes: List[str]) -> List[str]:
+        if self.spec.algorithm == "salience":
+            from src.algorithms.selection import score_quotes
+
+            with span(self.run_id, "campaign", "rank", "Quotes ranked by salience") as s:
+                ranked = score_quotes(quotes)
+                quotes = [qs.quote for qs in ranked]
+                s.extra = {"top_example": ranked[0].details if ranked else {}}
+        if self.spec.limit:
+            quotes = quotes[: self.spec.limit]
+            log(self.run_id, "campaign", "limit", "info", f"Limited to {len(quotes)} quotes")
+        return quotes
+
+    def render(self, quotes: List[str]) -> List[Path]:
+        from src.marketing.generator import create_quote_tile
+
+        checkpoint = self._checkpoint("render") or {}
+        done: Dict[str, str] = checkpoint.get("tiles", {})
+        if checkpoint.get("complete"):
+            return [self.tiles_dir / done[str(i)] for i in range(1, len(quotes) + 1)]
+        self.tiles_dir.mkdir(parents=True, exist_ok=True)
+        todo = {}
+        for idx, quote in enumerate(quotes, start=1):
+            path = self.tile_path(idx)
+            if not (done.get(str(idx)) == path.name and path.exists()):
+                todo[idx] = (quote, path)
+        with span(self.run_id, "campaign", "tiles", extra={"dir": str(self.tiles_dir)}) as s:
+            if self.render_pool is None:
+                finished = ((idx, create_quote_tile(q, self.spec.author, p)) for idx, (q, p) in todo.items())
+            else:
+                futures = {self.render_pool.submit(create_quote_tile, q, self.spec.author, p): idx
+                           for idx, (q, p) in todo.items()}
+                finished = ((futures[f], f.result()) for f in as_completed(futures))
+            for idx, path in finished:
+                done[str(idx)] = path.name
+                self._save("render", {"complete": False, "tiles": done})
+            s.message = f"Generated {len(todo)} tiles ({len(quotes) - len(todo)} from checkpoint)"
+        self._save("render", {"complete": True, "tiles": done})
+        return [self.tiles_dir / done[str(i)] for i in range(1, len(quotes) + 1)]
+
+    def post(self, quotes: List[str], tiles: List[Path]) -> Dict[str, Dict[str, Any]]:
+        from src.marketing.generator import compose_message
+
+        checkpoint = self._checkpoint("post") or {}
+        posted: Dict[str, Dict[str, Any]] = checkpoint.get("posts", {})
+        if checkpoint.get("complete"):
+            return posted
+        for idx, (quote, tile) in enumerate(zip(quotes, tiles), start=1):
+            item = posted.setdefault(str(idx), {})
+            message = compose_message(self.spec.title, self.spec.author, quote)
+            for platform in self.spec.platforms:
+                self._post_checkpointed(posted, item, platform, idx, message, tile)
+        self._save("post", {"complete": True, "posts": posted})
+        return posted
+
+    def _post_checkpointed(self, posted: Dict[str, Dict[str, Any]], item: Dict[str, Any], platform: str, idx: int,
+                           message: str, tile: Path) -> None:
+        if platform in item:
+            if is_pending(item[platform]):
+                log(self.run_id, "campaign", f"{platform}_{idx}", "error",
+                    f"Post {idx} to {platform} was interrupted and may be live; check it, then remove the "
+                    f"entry from post.json to retry")
+            return
+        # The marker is on disk before the request, so a crash mid-post is never retried blindly.
+        item[platform] = {"pending": True}
+        self._save("post", {"complete": False, "posts": posted})
+        try:
+            item[platform] = self._post_one(platform, idx, message, tile)
+        except BaseException:
+            del item[platform]  # the request failed, nothing was posted
+            self._save("post", {"complete": False, "posts": posted})
+            raise
+        self._save("post", {"complete": False, "posts": posted})
+
+    def _post_one(self, platform: str, idx: int, message: str, tile: Path) -> Any:
+        if platform == "facebook":
+            from src.marketing.facebook import post_to_facebook
+
+            with span(self.run_id, "campaign", f"fb_{idx}", f"Posted {tile.name}", metric="fb_post"):
+                return post_to_facebook(message, tile)
+        from src.marketing.wordpress import post_to_wordpress
+
+        with span(self.run_id, "campaign", f"wp_{idx}", f"Posted {tile.name}", metric="wp_post"):
+            return post_to_wordpress(f"{self.spec.title or 'Book'} — Quote", message, tile)
+
+    def tile_path(self, idx: int) -> Path:
+        return self.tiles_dir / f"quote_{idx:02d}.png"
+
+    def _run_staged(self, result: CampaignResult) -> Tuple[List[str], List[Path], Dict[str, Dict[str, Any]]]:
+        ingest = self._checkpoint("ingest")
+        if ingest is None:
+            ingest = {"quotes": self.ingest()}
+            self._save("ingest", ingest)
+        else:
+            result.skipped.append("ingest")
+
+        score = self._checkpoint("score")
+        if score is None or not score.get("complete", True):
+            score = {"complete": True, "quotes": self.score(ingest["quotes"])}
+            self._save("score", score)
+        else:
+            result.skipped.append("score")
+        quotes: List[str] = score["quotes"]
+
+        if (self._checkpoint("render") or {}).get("complete"):
+            result.skipped.append("render")
+        tiles = self.render(quotes)
+
+        if (self._checkpoint("post") or {}).get("complete"):
+            result.skipped.append("post")
+        return quotes, tiles, self.post(quotes, tiles)
+
+    def run(self) -> CampaignResult:
+        """Run the stages (in order, or pipelined with ``spec.pipeline``), restoring completed work."""
+        result = CampaignResult(self.run_id, self.run_dir)
+        resumed = any((self.run_dir / f"{stage}.json").exists() for stage in ("ingest", "score", "render", "post"))
+        log(self.run_id, "campaign", "resume" if resumed else "start", "started",
+            "Campaign resumed" if resumed else "Campaign started", {"run_dir": str(self.run_dir)})
+        try:
+            if self.spec.pipeline:
+                from src.marketing.pipeline import run_pipelined
+
+                quotes, tiles, posted = run_pipelined(self, result)
+            else:
+                quotes, tiles, posted = self._run_staged(result)
+            result.quotes, result.tiles = len(quotes), len(tiles)
+            result.posts = {p: sum(p in item and not is_pending(item[p]) for item in posted.values())
+                            for p in self.spec.platforms}
+            result.unconfirmed = [f"{idx}:{p}" for idx, item in posted.items() for p, entry in item.items()
+                                  if is_pending(entry)]
+            if result.skipped:
+                log(self.run_id, "campaign", "resume", "info", f"Restored from checkpoints: {', '.join(result.skipped)}")
+            log(self.run_id, "campaign", "done", "success", "Campaign finished")
+            return result
+        except Exception as e:
+            log(self.run_id, "campaign", "error", "error", str(e))
+            raise
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.config import config, ensure_output_dir
+from src.marketing.campaign import CampaignRun, CampaignSpec
+from src.tracking.progress import generate_run_id, log
+
+
+PLATFORMS = {"facebook", "wordpress"}
+
+
+@dataclass
+class BookOutcome:
+    title: str
+    run_id: str = ""
+    run_dir: str = ""
+    quotes: int = 0
+    tiles: int = 0
+    posts: Dict[str, int] = field(default_factory=dict)
+    unconfirmed: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+    error: str = ""
+
+
+def load_manifest(path: Path) -> List[CampaignSpec]:
+    """Read a JSON or YAML manifest into one spec per book.
+
+    The manifest has a ``books`` list and optional ``defaults`` merged into
+    every book. Each book takes the ``campaign`` options (``title``,
+    ``author``, ``images`` or ``quotes_file``, ``algorithm``, ``limit``,
+    ``out_dir``) plus ``platforms: [facebook, wordpress]``. Relative paths are
+    resolved against the manifest's directory.
+    """
+    text = path.read_text(encoding="utf-8")
+    if path.suffix.lower() in {".yaml", ".yml"}:
+        try:
+            import yaml
+        except ImportError:
+            raise SystemExit("YAML manifests need PyYAML (pip install pyyaml); or use a .json manifest")
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    if isinstance(data, list):
+        data = {"books": data}
+    if not isinstance(data, dict) or not isinstance(data.get("books"), list):
+        raise ValueError(f"{path}: manifest needs a 'books' list")
+
+    base = path.parent
+    specs: List[CampaignSpec] = []
+    for i, book in enumerate(data["books"], start=1):
+        entry: Dict[str, Any] = {**(data.get("defaults") or {}), **book}
+        platforms = set(entry.pop("platforms", []) or [])
+        if platforms - PLATFORMS:
+            raise ValueError(f"{path}: book {i} has unsupported platforms {sorted(platforms - PLATFORMS)}")
+        entry.setdefault("post_facebook", "facebook" in platforms)
+        entry.setdefault("post_wordpress", "wordpress" in platforms)
+        for key in ("images", "quotes_file", "out_dir"):
+            if entry.get(key):
+                entry[key] = str(base / Path(entry[key]).expanduser())
+        spec = CampaignSpec.from_dict(entry)
+        if not (spec.images or spec.quotes_file):
+            raise ValueError(f"{path}: book {i} ({spec.title or 'untitled'}) needs images or quotes_file")
+        specs.append(spec)
+    return specs
+
+
+def _run_book(spec: CampaignSpec, render_pool: ThreadPoolExecutor) -> BookOutcome:
+    outcome = BookOutcome(spec.title)
+    start = time.perf_counter()
+    try:
+        run = CampaignRun.create(spec, render_pool=render_pool)
+        outcome.run_id, outcome.run_dir = run.run_id, str(run.run_dir)
+        result = run.run()
+        outcome.quotes, outcome.tiles, outcome.posts = result.quotes, result.tiles, result.posts
+        outcome.unconfirmed = result.unconfirmed
+    except (Exception, SystemExit) as e:
+        # One bad book is reported in the summary; the rest of the batch still runs.
+        outcome.error = str(e) or type(e).__name__
+    outcome.seconds = round(time.perf_counter() - start, 3)
+    return outcome
+
+
+def run_batch(specs: List[CampaignSpec], book_workers: int = 1,
+              render_workers: Optional[int] = None) -> Dict[str, Any]:
+    """Run every book's campaign in this process and return a combined summary.
+
+    All books share the process-wide cache handles, the quote-tile font cache,
+    the HTTP session from ``src.utils.http`` and one tile render pool
+    (``CAMPAIGN_RENDER_WORKERS``). ``book_workers`` books run at a time. Each
+    book is an ordinary checkpointed run, so a failed one can be finished
+    with ``campaign --resume <run_id>``.
+    """
+    batch_id = generate_run_id("campaign-batch")
+    log(batch_id, "campaign_batch", "start", "started", f"Batch of {len(specs)} books")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=render_workers or config.campaign_render_workers,
+                            thread_name_prefix="tiles") as render_pool:
+        if book_workers <= 1:
+            outcomes = [_run_book(spec, render_pool) for spec in specs]
+        else:
+            with ThreadPoolExecutor(max_workers=book_workers, thread_name_prefix="book") as books:
+                outcomes = list(books.map(lambda spec: _run_book(spec, render_pool), specs))
+
+    totals: Dict[str, int] = {}
+    for o in outcomes:
+        for platform, n in o.posts.items():
+            totals[platform] = totals.get(platform, 0) + n
+    summary = {
+        "batch_id": batch_id,
+        "books": [asdict(o) for o in outcomes],
+        "succeeded": sum(not o.error for o in outcomes),
+        "failed": sum(bool(o.error) for o in outcomes),
+        "tiles": sum(o.tiles for o in outcomes),
+        "posts": totals,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    status = "success" if not summary["failed"] else "error"
+    log(batch_id, "campaign_batch", "done", status,
+        f"{summary['succeeded']}/{len(outcomes)} books, {summary['tiles']} tiles", {"run_ids": [o.run_id for o in outcomes]})
+    out = Path(ensure_output_dir()) / "campaign" / f"{batch_id}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+    summary["summary_path"] = str(out)
+    return summary
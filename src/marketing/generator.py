@@ -1,27 +1,40 @@
 from __future__ import annotations
 
+import functools
 from pathlib import Path
 from typing import List
 
 from PIL import Image, ImageDraw, ImageFont
 import random
 
+from src.tracking.progress import timed
 
+
+@functools.lru_cache(maxsize=16)
 def _load_font(size: int) -> ImageFont.ImageFont:
     try:
         return ImageFont.truetype("arial.ttf", size)
     except Exception:
+        pass
+    try:
+        return ImageFont.load_default(size=size)
+    except (TypeError, ImportError, OSError):
         return ImageFont.load_default()
 
 
+def _text_size(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.ImageFont, spacing: int = 4) -> tuple[int, int]:
+    # textsize/multiline_textsize were removed in Pillow 10.
+    left, top, right, bottom = draw.multiline_textbbox((0, 0), text, font=font, spacing=spacing)
+    return right - left, bottom - top
+
+
 def _wrap(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.ImageFont, max_width: int) -> str:
     words = text.split()
     lines: list[str] = []
     cur: list[str] = []
     for w in words:
         test = " ".join(cur + [w])
-        w_px, _ = draw.textsize(test, font=font)
-        if w_px <= max_width:
+        if draw.textlength(test, font=font) <= max_width:
             cur.append(w)
         else:
             if cur:
@@ -32,13 +45,16 @@ def _wrap(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.ImageFont, max_w
     return "\n".join(lines)
 
 
+@timed("render", "quote_tile")
 def create_quote_tile(quote: str, author: str, out_path: Path, size: int = 1080) -> Path:
     out_path.parent.mkdir(parents=True, exist_ok=True)
     bg_colors = [(18, 18, 22), (24, 28, 32), (10, 30, 60), (60, 20, 20)]
     fg_colors = [(240, 240, 240), (230, 230, 230), (255, 255, 255)]
     accent = (255, 215, 0)
 
-    img = Image.new("RGB", (size, size), random.choice(bg_colors))
+    # Seeded by the quote so a re-rendered (e.g. resumed) tile looks the same.
+    rng = random.Random(f"{quote}\0{author}")
+    img = Image.new("RGB", (size, size), rng.choice(bg_colors))
     draw = ImageDraw.Draw(img)
 
     quote_font = _load_font(48)
@@ -48,15 +64,15 @@ def create_quote_tile(quote: str, author: str, out_path: Path, size: int = 1080)
     max_w = size - margin * 2
 
     wrapped = _wrap(draw, f"“{quote}”", quote_font, max_w)
-    w, h = draw.multiline_textsize(wrapped, font=quote_font, spacing=8)
+    w, h = _text_size(draw, wrapped, quote_font, spacing=8)
     x = (size - w) // 2
     y = (size - h) // 2 - 40
 
     draw.multiline_text((x+2, y+2), wrapped, font=quote_font, fill=(0,0,0), spacing=8)
-    draw.multiline_text((x, y), wrapped, font=quote_font, fill=random.choice(fg_colors), spacing=8, align="center")
+    draw.multiline_text((x, y), wrapped, font=quote_font, fill=rng.choice(fg_colors), spacing=8, align="center")
 
     author_text = f"— {author}" if author else ""
-    w_a, h_a = draw.textsize(author_text, font=author_font)
+    w_a, h_a = _text_size(draw, author_text, author_font)
     draw.text(((size - w_a)//2, y + h + 20), author_text, font=author_font, fill=accent)
 
     img.save(out_path)
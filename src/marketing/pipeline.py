@@ -0,0 +1,357 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterator, List, Tuple
+
+from src.config import config
+from src.tracking.progress import log
+
+if TYPE_CHECKING:
+    from src.marketing.campaign import CampaignResult, CampaignRun
+
+
+_DONE = object()
+
+
+class _Aborted(Exception):
+    pass
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    busy: float = 0.0  # seconds spent working, summed over the stage's workers
+    started: float = 0.0
+    finished: float = 0.0
+
+    def as_extra(self) -> Dict[str, Any]:
+        wall = max(1e-9, (self.finished or time.monotonic()) - self.started)
+        return {"items": self.items, "busy_s": round(self.busy, 3), "wall_s": round(wall, 3),
+                "per_sec": round(self.items / wall, 2)}
+
+
+class _Pipeline:
+    """ingest → score → render → post as threads joined by bounded queues.
+
+    A full queue blocks its producer, so no stage runs more than
+    ``CAMPAIGN_QUEUE_SIZE`` items ahead of the next one and throughput settles
+    at the slowest stage's. The first error aborts every stage.
+    """
+
+    def __init__(self, run: "CampaignRun", queue_size: int, ocr_workers: int, render_workers: int,
+                 window: int, sample_interval: float) -> None:
+        self.run = run
+        self.ocr_workers = ocr_workers
+        self.render_workers = render_workers
+        # With a shared pool one thread feeds it; otherwise render_workers threads render locally.
+        self.render_threads = 1 if run.render_pool is not None else render_workers
+        self.window = window
+        self.sample_interval = sample_interval
+        self.queues: Dict[str, "queue.Queue[Any]"] = {
+            name: queue.Queue(maxsize=queue_size) for name in ("ingest->score", "score->render", "render->post")
+        }
+        self.max_depth = {name: 0 for name in self.queues}
+        self.stats = {name: StageStats(name) for name in ("ingest", "score", "render", "post")}
+        self.abort = threading.Event()
+        self.stop_ingest = threading.Event()  # set once the scorer has emitted --limit quotes
+        self.errors: List[BaseException] = []
+        self.lock = threading.Lock()
+        self.quotes: List[str] = []
+        self.tiles: Dict[int, Path] = {}
+        self.ingested: List[str] = []
+        # Per-item checkpoints from an interrupted attempt; finished tiles and posts are skipped.
+        self.render_done: Dict[str, str] = dict((run._checkpoint("render") or {}).get("tiles", {}))
+        self.posted: Dict[str, Dict[str, Any]] = (run._checkpoint("post") or {}).get("posts", {})
+
+    # Queue helpers that give up when another stage has failed.
+    def _put(self, name: str, item: Any) -> None:
+        q = self.queues[name]
+        while True:
+            if self.abort.is_set():
+                raise _Aborted()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, name: str) -> Any:
+        q = self.queues[name]
+        while True:
+            if self.abort.is_set():
+                raise _Aborted()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _stage(self, name: str, fn: Callable[[], None]) -> Callable[[], None]:
+        def runner() -> None:
+            stats = self.stats[name]
+            with self.lock:
+                stats.started = stats.started or time.monotonic()
+            try:
+                fn()
+            except _Aborted:
+                pass
+            except BaseException as e:
+                with self.lock:
+                    self.errors.append(e)
+                self.abort.set()
+            finally:
+                with self.lock:
+                    stats.finished = time.monotonic()
+        return runner
+
+    def _timed(self, name: str, started: float) -> None:
+        with self.lock:
+            self.stats[name].items += 1
+            self.stats[name].busy += time.monotonic() - started
+
+    # Stages
+    def _quote_source(self) -> Iterator[str]:
+        spec = self.run.spec
+        if spec.quotes_file:
+            with open(spec.quotes_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield line.strip()
+            return
+        if not spec.images:
+            return
+        from src.marketing.campaign import IMAGE_SUFFIXES
+        from src.ocr.extract import extract_quotes, ocr_image
+
+        paths = sorted(p for p in Path(spec.images).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        with ThreadPoolExecutor(max_workers=self.ocr_workers, thread_name_prefix="ocr") as pool:
+            # At most ocr_workers images in flight, consumed in file order so the run is reproducible.
+            pending = deque(pool.submit(ocr_image, p) for p in paths[: self.ocr_workers])
+            rest = iter(paths[self.ocr_workers:])
+            try:
+                while pending and not self.stop_ingest.is_set():
+                    text = pending.popleft().result()
+                    nxt = next(rest, None)
+                    if nxt is not None:
+                        pending.append(pool.submit(ocr_image, nxt))
+                    yield from extract_quotes(text)
+            finally:
+                for f in pending:
+                    f.cancel()
+
+    def ingest(self) -> None:
+        source = self._quote_source()
+        try:
+            while not self.stop_ingest.is_set():
+                started = time.monotonic()
+                quote = next(source, None)
+                if quote is None:
+                    break
+                self._timed("ingest", started)
+                self.ingested.append(quote)
+                self._put("ingest->score", quote)
+        finally:
+            source.close()  # shuts down the OCR pool when we stop before the last image
+        self._put("ingest->score", _DONE)
+
+    def score(self) -> None:
+        from src.algorithms.selection import compute_quote_score, novelty_key
+
+        spec = self.run.spec
+        prior = (self.run._checkpoint("score") or {}).get("quotes", [])
+        seen: set = set()
+        window: List[Tuple[float, int, str]] = []
+
+        def emit() -> bool:
+            # Best first within the window; returns False once --limit quotes have been emitted.
+            for _, _, quote in sorted(window, key=lambda w: (-w[0], w[1])):
+                if spec.limit and len(self.quotes) >= spec.limit:
+                    break
+                idx = len(self.quotes) + 1
+                if idx <= len(prior) and prior[idx - 1] != quote:
+                    raise RuntimeError("Quote sources changed since this run was interrupted; start a new campaign")
+                self.quotes.append(quote)
+                self.run._save("score", {"complete": False, "quotes": self.quotes})
+                self._put("score->render", (idx, quote))
+            window.clear()
+            return not (spec.limit and len(self.quotes) >= spec.limit)
+
+        arrived = 0
+        while True:
+            quote = self._get("ingest->score")
+            if quote is _DONE:
+                break
+            started = time.monotonic()
+            if spec.algorithm == "salience":
+                qs = compute_quote_score(quote)
+                key = novelty_key(quote)
+                if key in seen:
+                    qs.score *= 0.7
+                seen.add(key)
+                window.append((qs.score, arrived, quote))
+            else:
+                window.append((0.0, arrived, quote))
+            arrived += 1
+            self._timed("score", started)
+            if len(window) >= self.window and not emit():
+                self.stop_ingest.set()
+                self._drain("ingest->score")
+                break
+        if window:
+            emit()
+        for _ in range(self.render_threads):
+            self._put("score->render", _DONE)
+
+    def _drain(self, name: str) -> None:
+        # Unblock an upstream producer after we stopped consuming early.
+        while self._get(name) is not _DONE:
+            pass
+
+    def _render_tile(self, idx: int, quote: str) -> Path:
+        from src.marketing.generator import create_quote_tile
+
+        path = self.run.tile_path(idx)
+        started = time.monotonic()
+        with self.lock:
+            done = self.render_done.get(str(idx)) == path.name and path.exists()
+        if not done:
+            create_quote_tile(quote, self.run.spec.author, path)
+            with self.lock:
+                self.render_done[str(idx)] = path.name
+                self.run._save("render", {"complete": False, "tiles": dict(self.render_done)})
+        self._timed("render", started)
+        return path
+
+    def _rendered(self, idx: int, quote: str, path: Path) -> None:
+        with self.lock:
+            self.tiles[idx] = path
+        self._put("render->post", (idx, quote, path))
+
+    def render(self) -> None:
+        while True:
+            item = self._get("score->render")
+            if item is _DONE:
+                break
+            idx, quote = item
+            self._rendered(idx, quote, self._render_tile(idx, quote))
+        self._put("render->post", _DONE)
+
+    def render_pooled(self) -> None:
+        # Tiles go to the run's shared pool (campaign-batch); at most render_workers in flight, forwarded in order.
+        pool = self.run.render_pool
+        assert pool is not None
+        in_flight: Deque[Tuple[int, str, "Future[Path]"]] = deque()
+
+        def forward() -> None:
+            idx, quote, fut = in_flight.popleft()
+            self._rendered(idx, quote, fut.result())
+
+        try:
+            while True:
+                item = self._get("score->render")
+                if item is _DONE:
+                    break
+                idx, quote = item
+                in_flight.append((idx, quote, pool.submit(self._render_tile, idx, quote)))
+                while len(in_flight) >= self.render_workers:
+                    forward()
+            while in_flight:
+                forward()
+        finally:
+            for _, _, fut in in_flight:
+                fut.cancel()
+        self._put("render->post", _DONE)
+
+    def post(self) -> None:
+        from src.marketing.generator import compose_message
+
+        spec = self.run.spec
+        remaining = self.render_threads
+        while remaining:
+            item = self._get("render->post")
+            if item is _DONE:
+                remaining -= 1
+                continue
+            idx, quote, tile = item
+            started = time.monotonic()
+            entry = self.posted.setdefault(str(idx), {})
+            message = compose_message(spec.title, spec.author, quote)
+            for platform in spec.platforms:
+                self.run._post_checkpointed(self.posted, entry, platform, idx, message, tile)
+            self._timed("post", started)
+
+    def _sample(self) -> None:
+        # Periodic queue-depth samples, so a stalled stage shows up in `progress --follow`.
+        while not self.abort.wait(self.sample_interval):
+            depths = {name: q.qsize() for name, q in self.queues.items()}
+            with self.lock:
+                for name, d in depths.items():
+                    self.max_depth[name] = max(self.max_depth[name], d)
+            log(self.run.run_id, "pipeline", "queues", "info",
+                " ".join(f"{n}={d}" for n, d in depths.items()), {"depth": depths})
+
+    def execute(self) -> None:
+        self.run.tiles_dir.mkdir(parents=True, exist_ok=True)
+        threads = [threading.Thread(target=self._stage("ingest", self.ingest), name="pipeline-ingest"),
+                   threading.Thread(target=self._stage("score", self.score), name="pipeline-score"),
+                   threading.Thread(target=self._stage("post", self.post), name="pipeline-post")]
+        if self.run.render_pool is not None:
+            threads.append(threading.Thread(target=self._stage("render", self.render_pooled), name="pipeline-render"))
+        else:
+            threads += [threading.Thread(target=self._stage("render", self.render), name=f"pipeline-render-{i}")
+                        for i in range(self.render_workers)]
+        sampler = threading.Thread(target=self._sample, name="pipeline-sampler", daemon=True)
+        for t in threads:
+            t.start()
+        sampler.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(0.25)
+        except KeyboardInterrupt:
+            self.abort.set()
+            for t in threads:
+                t.join()
+            raise
+        finally:
+            self.abort.set()  # also stops the sampler
+        for name, stats in self.stats.items():
+            log(self.run.run_id, "pipeline", name, "error" if self.errors else "success",
+                f"{stats.items} items", stats.as_extra())
+        log(self.run.run_id, "pipeline", "queues", "info", "max queue depth", {"max_depth": self.max_depth})
+        if self.errors:
+            raise self.errors[0]
+
+
+def run_pipelined(run: "CampaignRun", result: "CampaignResult") -> Tuple[List[str], List[Path], Dict[str, Dict[str, Any]]]:
+    """Pipelined counterpart of the staged campaign; writes the same checkpoints.
+
+    Ranking is windowed: quotes are scored as they arrive and emitted best
+    first within groups of ``CAMPAIGN_RANK_WINDOW``, so ``--limit`` picks the
+    best quotes per window rather than over the whole book.
+    """
+    post_cp = run._checkpoint("post") or {}
+    score_cp = run._checkpoint("score") or {}
+    if post_cp.get("complete") and score_cp.get("complete"):
+        result.skipped += ["ingest", "score", "render", "post"]
+        quotes = score_cp["quotes"]
+        return quotes, [run.tile_path(i) for i in range(1, len(quotes) + 1)], post_cp["posts"]
+
+    pipe = _Pipeline(run, queue_size=config.campaign_queue_size, ocr_workers=config.campaign_ocr_workers,
+                     render_workers=config.campaign_render_workers, window=config.campaign_rank_window,
+                     sample_interval=config.campaign_sample_interval)
+    pipe.execute()
+    if not pipe.quotes:
+        log(run.run_id, "campaign", "no_quotes", "error", "No quotes found")
+        raise SystemExit("No quotes found. Provide --images or --quotes_file.")
+    run._save("ingest", {"quotes": pipe.ingested})
+    run._save("score", {"complete": True, "quotes": pipe.quotes})
+    run._save("render", {"complete": True, "tiles": pipe.render_done})
+    run._save("post", {"complete": True, "posts": pipe.posted})
+    return pipe.quotes, [pipe.tiles[i] for i in range(1, len(pipe.quotes) + 1)], pipe.posted
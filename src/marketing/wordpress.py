@@ -4,9 +4,8 @@ import base64
 from pathlib import Path
 from typing import Optional
 
-import requests
-
 from src.config import config
+from src.utils.http import get_session
 
 
 def _wp_auth_header() -> dict[str, str]:
@@ -18,10 +17,11 @@ def post_to_wordpress(title: str, content: str, featured_image_path: Optional[Pa
     if not (config.wp_base_url and config.wp_username and config.wp_application_password):
         raise RuntimeError("WordPress credentials missing in .env")
 
+    session = get_session()
     media_id: Optional[int] = None
     if featured_image_path:
         with open(featured_image_path, "rb") as f:
-            media_resp = requests.post(
+            media_resp = session.post(
                 f"{config.wp_base_url}/wp-json/wp/v2/media",
                 headers={**_wp_auth_header(), "Content-Disposition": f"attachment; filename={featured_image_path.name}"},
                 files={"file": (featured_image_path.name, f, "image/png")},
@@ -34,6 +34,6 @@ def post_to_wordpress(title: str, content: str, featured_image_path: Optional[Pa
     if media_id:
         post["featured_media"] = media_id
 
-    resp = requests.post(f"{config.wp_base_url}/wp-json/wp/v2/posts", headers=_wp_auth_header(), json=post, timeout=60)
+    resp = session.post(f"{config.wp_base_url}/wp-json/wp/v2/posts", headers=_wp_auth_header(), json=post, timeout=60)
     resp.raise_for_status()
     return resp.json().get("id")
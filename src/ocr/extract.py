@@ -3,13 +3,14 @@ from __future__ import annotations
 import re
 import hashlib
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, List, Optional
 
 import cv2
 import numpy as np
 import pytesseract
 
 from src.config import config
+from src.tracking.progress import timed
 from src.utils.cache import memoize
 
 
@@ -32,9 +33,14 @@ def _prepare_image_for_ocr(image_path: Path) -> np.ndarray:
     return thresh
 
 
-def _ocr_image_cached(image_path: Path) -> str:
-    file_hash = _hash_file(image_path)
-    key = f"ocr:{file_hash}"
+def ocr_cache_key(file_hash: str) -> str:
+    return f"ocr:{file_hash}"
+
+
+@timed("ocr", "image")
+def ocr_image(image_path: Path, file_hash: Optional[str] = None) -> str:
+    # Callers that already hashed the file (e.g. uploads) pass file_hash to skip re-reading it.
+    key = ocr_cache_key(file_hash or _hash_file(image_path))
 
     def run() -> str:
         processed = _prepare_image_for_ocr(image_path)
@@ -43,13 +49,13 @@ def _ocr_image_cached(image_path: Path) -> str:
     if config.tesseract_cmd:
         pytesseract.pytesseract.tesseract_cmd = config.tesseract_cmd
 
-    return memoize(key, run)
+    return memoize(key, run, namespace="ocr")
 
 
 def extract_text_from_images(image_paths: Iterable[Path]) -> str:
     texts: List[str] = []
     for path in image_paths:
-        text = _ocr_image_cached(path)
+        text = ocr_image(path)
         texts.append(text)
     return "\n\n".join(texts)
 
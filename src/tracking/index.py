@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    indexed_upto INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS offsets (
+    file TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    run_id TEXT NOT NULL,
+    PRIMARY KEY (file, offset)
+);
+CREATE INDEX IF NOT EXISTS offsets_run ON offsets (run_id, file, offset);
+"""
+
+
+class ProgressIndex:
+    """Sidecar byte-offset index mapping run_id -> line offsets in JSONL files.
+
+    The JSONL files stay the source of truth; the index only remembers where
+    each run's lines start and how far each file has been scanned, so catching
+    up after new appends costs O(new bytes) and a run lookup costs
+    O(records in that run).
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._ready = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def sync(self, path: Path) -> int:
+        """Index lines appended to ``path`` since the last sync. Returns lines added."""
+        if not path.exists():
+            return 0
+        name = path.name
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                st = path.stat()
+                row = conn.execute("SELECT inode, indexed_upto FROM files WHERE name = ?", (name,)).fetchone()
+                start = 0
+                if row is not None:
+                    inode, start = row
+                    if inode != st.st_ino or st.st_size < start:
+                        # File was replaced or truncated; its old offsets are meaningless.
+                        conn.execute("DELETE FROM offsets WHERE file = ?", (name,))
+                        start = 0
+                if st.st_size == start:
+                    conn.execute("COMMIT")
+                    return 0
+                rows, end = _scan(path, start)
+                conn.executemany(
+                    "INSERT OR IGNORE INTO offsets (file, offset, run_id) VALUES (?, ?, ?)",
+                    ((name, off, run_id) for off, run_id in rows),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO files (name, inode, indexed_upto) VALUES (?, ?, ?)",
+                    (name, st.st_ino, end),
+                )
+                conn.execute("COMMIT")
+                return len(rows)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def offsets(self, run_id: str) -> List[Tuple[str, int]]:
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT file, offset FROM offsets WHERE run_id = ? ORDER BY file, offset", (run_id,)
+            ).fetchall()
+
+    def forget(self, name: str) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM offsets WHERE file = ?", (name,))
+            conn.execute("DELETE FROM files WHERE name = ?", (name,))
+
+    def rebuild(self, paths: List[Path]) -> int:
+        """Drop the index and rebuild it from ``paths`` (JSONL -> index migration)."""
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM offsets")
+            conn.execute("DELETE FROM files")
+        return sum(self.sync(p) for p in paths)
+
+
+def _scan(path: Path, start: int) -> Tuple[List[Tuple[int, str]], int]:
+    # Only complete lines are indexed; a half-written trailing line is picked
+    # up on the next sync once its newline lands.
+    rows: List[Tuple[int, str]] = []
+    offset = start
+    with path.open("rb") as f:
+        f.seek(start)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                run_id = json.loads(line).get("run_id")
+            except Exception:
+                run_id = None
+            if run_id:
+                rows.append((offset, run_id))
+            offset += len(line)
+    return rows, offset
+
+
+def read_lines_at(path: Path, offsets: List[int]) -> Iterator[bytes]:
+    if not offsets:
+        return
+    with path.open("rb") as f:
+        for off in offsets:
+            f.seek(off)
+            yield f.readline()
+
+
+def index_path(progress_file: Path) -> Path:
+    return progress_file.with_name(progress_file.name + ".idx")
+
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+from src.tracking.segments import _pid_alive
+
+
+# Seconds; wide enough for a 10 ms tile draw and a multi-minute OCR batch.
+DURATION_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+
+@dataclass
+class Histogram:
+    count: int = 0
+    errors: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    # counts[i] = observations <= DURATION_BUCKETS[i] (non-cumulative); last slot is +Inf.
+    counts: List[int] = field(default_factory=lambda: [0] * (len(DURATION_BUCKETS) + 1))
+
+    def observe(self, seconds: float, error: bool = False) -> None:
+        self.count += 1
+        self.errors += int(error)
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.counts[bisect.bisect_left(DURATION_BUCKETS, seconds)] += 1
+
+    def merge(self, other: "Histogram") -> None:
+        self.count += other.count
+        self.errors += other.errors
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def quantile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation.
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(DURATION_BUCKETS, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._hists: Dict[Tuple[str, str], Histogram] = {}
+
+    def observe(self, phase: str, name: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            h = self._hists.get((phase, name))
+            if h is None:
+                h = self._hists[(phase, name)] = Histogram()
+            h.observe(seconds, error)
+
+    def snapshot(self) -> Dict[Tuple[str, str], Histogram]:
+        with self._lock:
+            return {k: Histogram(h.count, h.errors, h.total, h.max, list(h.counts)) for k, h in self._hists.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hists.clear()
+
+
+def _dump(hists: Dict[Tuple[str, str], Histogram], path: Path) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps([{"phase": p, "name": n, **asdict(h)} for (p, n), h in hists.items()]),
+                   encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _load(path: Path) -> Dict[Tuple[str, str], Histogram]:
+    try:
+        entries = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return {(e.pop("phase"), e.pop("name")): Histogram(**e) for e in entries}
+
+
+def _merge_into(target: Dict[Tuple[str, str], Histogram], hists: Dict[Tuple[str, str], Histogram]) -> None:
+    for key, h in hists.items():
+        target.setdefault(key, Histogram()).merge(h)
+
+
+class SharedMetrics:
+    """Histograms of every process sharing ``directory``, summed on read.
+
+    Each process rewrites ``<pid>-<token>.json`` from its registry every
+    ``interval`` seconds. Readers fold the files of exited processes into
+    ``archive.json``, so the summed counters never go down while gunicorn
+    workers come and go, whichever worker answers the scrape.
+    """
+
+    ARCHIVE = "archive.json"
+
+    def __init__(self, registry: MetricsRegistry, directory: Path, interval: float = 5.0) -> None:
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._path: Optional[Path] = None
+        self._lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+        atexit.register(self.flush)  # a worker's last observations outlive it in the archive
+        self._start()
+
+    def _start(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path = self.directory / f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+        threading.Thread(target=self._loop, args=(path,), name="metrics-flush", daemon=True).start()
+
+    def _after_fork(self) -> None:
+        # The parent's observations are already in the parent's file; counting them here too would double them.
+        self._lock = threading.Lock()
+        self.registry.reset()
+        self._start()
+
+    def _loop(self, path: Path) -> None:
+        while self._path == path:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._path is not None:
+                _dump(self.registry.snapshot(), self._path)
+
+    def collect(self) -> Dict[Tuple[str, str], Histogram]:
+        self.flush()
+        lock_fd = os.open(self.directory / ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            archive_path = self.directory / self.ARCHIVE
+            total = _load(archive_path)
+            dead: List[Path] = []
+            for path in self.directory.glob("*-*.json"):
+                pid = path.name.split("-", 1)[0]
+                if not pid.isdigit():
+                    continue
+                if path == self._path or _pid_alive(int(pid)):
+                    _merge_into(total, _load(path))
+                else:
+                    dead.append(path)
+            if dead:
+                archive = _load(archive_path)
+                for path in dead:
+                    h = _load(path)
+                    _merge_into(archive, h)
+                    _merge_into(total, h)
+                _dump(archive, archive_path)
+                for path in dead:
+                    path.unlink(missing_ok=True)
+            return total
+        finally:
+            os.close(lock_fd)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus(hists: Dict[Tuple[str, str], Histogram], prefix: str = "tovias") -> str:
+    lines = [
+        f"# HELP {prefix}_phase_duration_seconds Duration of timed phases.",
+        f"# TYPE {prefix}_phase_duration_seconds histogram",
+    ]
+    for (phase, name), h in sorted(hists.items()):
+        labels = f'phase="{_label(phase)}",name="{_label(name)}"'
+        cumulative = 0
+        for bound, n in zip(DURATION_BUCKETS, h.counts):
+            cumulative += n
+            lines.append(f'{prefix}_phase_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{prefix}_phase_duration_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+        lines.append(f"{prefix}_phase_duration_seconds_sum{{{labels}}} {h.total:.6f}")
+        lines.append(f"{prefix}_phase_duration_seconds_count{{{labels}}} {h.count}")
+    lines.append(f"# HELP {prefix}_phase_errors_total Timed phases that raised.")
+    lines.append(f"# TYPE {prefix}_phase_errors_total counter")
+    for (phase, name), h in sorted(hists.items()):
+        lines.append(f'{prefix}_phase_errors_total{{phase="{_label(phase)}",name="{_label(name)}"}} {h.errors}')
+    return "\n".join(lines) + "\n"
+
+
+def format_report(hists: Dict[Tuple[str, str], Histogram]) -> Iterable[str]:
+    yield f"{'phase:name':<32} {'count':>6} {'errors':>6} {'mean':>8} {'p50':>8} {'p95':>8} {'max':>8}"
+    for (phase, name), h in sorted(hists.items()):
+        mean = h.total / h.count if h.count else 0.0
+        yield (f"{phase + ':' + name:<32} {h.count:>6} {h.errors:>6} {mean:>8.3f} "
+               f"{h.quantile(0.5):>8.3f} {h.quantile(0.95):>8.3f} {h.max:>8.3f}")
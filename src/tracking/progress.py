@@ -1,16 +1,26 @@
 from __future__ import annotations
 
+import functools
 import json
+import logging
+import os
 import time
+from contextlib import contextmanager
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from src.config import ensure_output_dir
+from src.config import config, ensure_output_dir
+from src.tracking import segments
+from src.tracking.index import ProgressIndex, index_path, read_lines_at
+from src.tracking.metrics import Histogram, MetricsRegistry, SharedMetrics, render_prometheus
+from src.tracking.writer import ProgressWriter
 
 
 PROGRESS_FILE_NAME = "progress.jsonl"
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class ProgressRecord:
@@ -23,16 +33,94 @@ class ProgressRecord:
     extra: Optional[Dict[str, Any]] = None
 
 
+def _progress_dir() -> str:
+    return config.progress_dir or config.output_dir
+
+
 def _progress_file() -> Path:
-    out_dir = Path(ensure_output_dir())
+    if not config.progress_dir:
+        ensure_output_dir()
+    out_dir = Path(_progress_dir())
     out_dir.mkdir(parents=True, exist_ok=True)
     return out_dir / PROGRESS_FILE_NAME
 
 
+_indexes: Dict[Path, ProgressIndex] = {}
+
+
+def _index(pf: Path) -> ProgressIndex:
+    idx = _indexes.get(pf)
+    if idx is None:
+        idx = _indexes[pf] = ProgressIndex(index_path(pf))
+    return idx
+
+
+_first_ts: Dict[int, float] = {}
+
+
+def _should_rotate(fd: int) -> bool:
+    st = os.fstat(fd)
+    if config.progress_segment_bytes and st.st_size >= config.progress_segment_bytes:
+        return True
+    if config.progress_segment_max_age:
+        first = _first_ts.get(st.st_ino)
+        if first is None:
+            # Age is measured from the first record of the active file.
+            head = os.pread(fd, 4096, 0).split(b"\n", 1)[0]
+            try:
+                first = float(json.loads(head)["timestamp"])
+            except Exception:
+                first = time.time()
+            _first_ts.clear()
+            _first_ts[st.st_ino] = first
+        return time.time() - first >= config.progress_segment_max_age
+    return False
+
+
+def _on_rotate(rotating: Path) -> None:
+    pf = rotating.parent / PROGRESS_FILE_NAME
+    # The active name now points at a fresh file; drop its stale offsets.
+    _index(pf).forget(pf.name)
+    try:
+        segments.seal(rotating, pf)
+    except OSError as e:
+        # Left as .rotating (or a claim) for seal_pending(); logging must never fail the caller.
+        logger.warning("Could not seal %s: %s", rotating, e)
+
+
+_writers: Dict[str, ProgressWriter] = {}
+
+
+def _writer() -> ProgressWriter:
+    # Keyed by directory so the hot path skips ensure_output_dir()/makedirs.
+    key = _progress_dir()
+    w = _writers.get(key)
+    if w is None:
+        w = _writers[key] = ProgressWriter(
+            _progress_file(), sync=config.progress_sync, flush_interval=config.progress_flush_interval,
+            should_rotate=_should_rotate, rotate_to=segments.rotating_path, on_rotate=_on_rotate,
+        )
+    return w
+
+
+def configure_writer(sync: Optional[bool] = None, flush_interval: Optional[float] = None) -> ProgressWriter:
+    # Tests call configure_writer(sync=True) so records are on disk as soon as log() returns.
+    w = _writer()
+    w.flush()
+    if sync is not None:
+        w.sync = sync
+    if flush_interval is not None:
+        w.flush_interval = flush_interval
+    return w
+
+
+def flush() -> None:
+    for w in list(_writers.values()):
+        w.flush()
+
+
 def _write_record(record: ProgressRecord) -> None:
-    pf = _progress_file()
-    with pf.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+    _writer().write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
 
 
 def generate_run_id(kind: str) -> str:
@@ -56,41 +144,321 @@ def log(run_id: str, phase: str, step: str, status: str, message: str, extra: Op
     _write_record(rec)
 
 
-def read_run(run_id: str) -> List[ProgressRecord]:
+registry = MetricsRegistry()
+
+
+@dataclass
+class Span:
+    run_id: Optional[str]
+    phase: str
+    step: str
+    metric: str
+    message: str = ""
+    extra: Optional[Dict[str, Any]] = None
+    duration: float = 0.0
+
+
+@contextmanager
+def span(run_id: Optional[str], phase: str, step: str, message: str = "",
+         extra: Optional[Dict[str, Any]] = None, metric: Optional[str] = None) -> Iterator[Span]:
+    """Time a block, feed the in-process histograms and log one record with its duration.
+
+    ``metric`` names the histogram (defaults to ``step``) so per-item steps such
+    as ``fb_3`` can share one series. The yielded span's ``message``/``extra``
+    may be filled in by the block. With ``run_id=None`` nothing is logged.
+    """
+    s = Span(run_id=run_id, phase=phase, step=step, metric=metric or step, message=message, extra=dict(extra or {}))
+    start = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        s.duration = time.perf_counter() - start
+        registry.observe(phase, s.metric, s.duration, error=True)
+        if run_id is not None:
+            log(run_id, phase, step, "error", str(e) or type(e).__name__,
+                {**(s.extra or {}), "duration_ms": round(s.duration * 1000, 3), "metric": s.metric})
+        raise
+    s.duration = time.perf_counter() - start
+    registry.observe(phase, s.metric, s.duration)
+    if run_id is not None:
+        log(run_id, phase, step, "success", s.message or f"{step} finished",
+            {**(s.extra or {}), "duration_ms": round(s.duration * 1000, 3), "metric": s.metric})
+
+
+def timed(phase: str, metric: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    # Metrics-only span for library functions that have no run_id to log against.
+    def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+        name = metric or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(None, phase, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def metrics_from_records(records: Iterable[ProgressRecord]) -> Dict[Tuple[str, str], Histogram]:
+    hists: Dict[Tuple[str, str], Histogram] = {}
+    for r in records:
+        extra = r.extra or {}
+        if "duration_ms" not in extra:
+            continue
+        key = (r.phase, extra.get("metric") or r.step)
+        hists.setdefault(key, Histogram()).observe(float(extra["duration_ms"]) / 1000.0, r.status == "error")
+    return hists
+
+
+_shared: Optional[SharedMetrics] = None
+
+
+def share_metrics() -> None:
+    """Publish this process's histograms under ``<progress dir>/metrics/`` and report the sum of all of them.
+
+    Called by the web app, so a ``/metrics`` scrape covers every gunicorn
+    worker instead of whichever one answered.
+    """
+    global _shared
+    if _shared is None:
+        _shared = SharedMetrics(registry, Path(_progress_dir()) / "metrics", config.metrics_flush_interval)
+
+
+def prometheus_metrics() -> str:
+    return render_prometheus(_shared.collect() if _shared is not None else registry.snapshot())
+
+
+def _parse_lines(lines: Iterable[bytes], run_id: str) -> List[ProgressRecord]:
+    records: List[ProgressRecord] = []
+    for line in lines:
+        try:
+            obj = json.loads(line)
+            if obj.get("run_id") == run_id:
+                records.append(ProgressRecord(**obj))
+        except Exception:
+            continue
+    return records
+
+
+def _inode(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_ino
+    except FileNotFoundError:
+        return None
+
+
+def _read_run_once(pf: Path, run_id: str) -> List[ProgressRecord]:
+    idx = _index(pf)
+    segments.seal_pending(pf)
+    # Sealed segments whose header does not list the run are never opened.
+    files = [seg for seg in segments.list_segments(pf)
+             if (h := segments.read_header(seg)) is None or run_id in h.run_ids]
+    if pf.exists():
+        files.append(pf)
+    for path in files:
+        idx.sync(path)
+    by_file: Dict[str, List[int]] = {}
+    for name, off in idx.offsets(run_id):
+        by_file.setdefault(name, []).append(off)
+    records: List[ProgressRecord] = []
+    for path in files:
+        records.extend(_parse_lines(read_lines_at(path, by_file.get(path.name, [])), run_id))
+    return records
+
+
+def read_run(run_id: str, attempts: int = 5) -> List[ProgressRecord]:
+    flush()
     pf = _progress_file()
     records: List[ProgressRecord] = []
-    if not pf.exists():
-        return records
-    with pf.open("r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                obj = json.loads(line)
-                if obj.get("run_id") == run_id:
-                    records.append(ProgressRecord(**obj))
-            except Exception:
-                continue
+    for _ in range(attempts):
+        # Another process may rotate the active file or compact a segment mid-read;
+        # the records then live somewhere else, so look again.
+        before = _inode(pf)
+        try:
+            records = _read_run_once(pf, run_id)
+        except FileNotFoundError:
+            continue
+        if _inode(pf) == before:
+            break
     return records
 
 
-def tail(n: int = 50) -> List[ProgressRecord]:
+def reindex() -> int:
+    # Rebuild the run_id index from the JSONL log (also migrates pre-index logs).
+    flush()
+    pf = _progress_file()
+    segments.seal_pending(pf)
+    files = segments.list_segments(pf) + ([pf] if pf.exists() else [])
+    return _index(pf).rebuild(files)
+
+
+def rotate() -> None:
+    _writer().rotate()
+
+
+def compact(older_than_days: Optional[float] = None) -> Dict[str, int]:
+    """Compact sealed segments older than the retention window into per-run
+    summaries and delete summaries past ``PROGRESS_SUMMARY_RETENTION_DAYS``."""
+    flush()
     pf = _progress_file()
-    if not pf.exists():
+    idx = _index(pf)
+    segments.seal_pending(pf)
+    days = config.progress_retention_days if older_than_days is None else older_than_days
+    now = time.time()
+    compacted = 0
+    for seg in segments.list_segments(pf):
+        header = segments.read_header(seg)
+        if header is not None and now - header.last_ts >= days * 86400:
+            idx.forget(seg.name)
+            if segments.compact(seg, _compact_summary) is not None:
+                compacted += 1
+    deleted = 0
+    if config.progress_summary_retention_days:
+        for summary in segments.list_summaries(pf):
+            header = segments.read_header(summary)
+            if header is not None and now - header.last_ts >= config.progress_summary_retention_days * 86400:
+                summary.unlink()
+                deleted += 1
+    return {"compacted": compacted, "deleted": deleted}
+
+
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def _iter_lines_reversed(path: Path, block_size: int = TAIL_BLOCK_SIZE) -> Iterator[bytes]:
+    # Seek backwards from EOF in fixed blocks so only the end of the log is read.
+    with path.open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        pending = b""
+        while pos > 0:
+            size = min(block_size, pos)
+            pos -= size
+            f.seek(pos)
+            lines = (f.read(size) + pending).split(b"\n")
+            # The first piece may be the tail of a line that starts in an earlier block.
+            pending = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if pending.strip():
+            yield pending
+
+
+def _matches(rec: ProgressRecord, run_id: Optional[str], phase: Optional[str], status: Optional[str]) -> bool:
+    return ((run_id is None or rec.run_id == run_id)
+            and (phase is None or rec.phase == phase)
+            and (status is None or rec.status == status))
+
+
+def tail(n: int = 50, run_id: Optional[str] = None, phase: Optional[str] = None,
+         status: Optional[str] = None) -> List[ProgressRecord]:
+    flush()
+    pf = _progress_file()
+    if n <= 0:
         return []
-    with pf.open("r", encoding="utf-8") as f:
-        lines = f.readlines()[-n:]
+    # Newest first: the active file, then sealed segments from the most recent.
+    files = ([pf] if pf.exists() else []) + list(reversed(segments.list_segments(pf)))
     recs: List[ProgressRecord] = []
-    for line in lines:
-        try:
-            recs.append(ProgressRecord(**json.loads(line)))
-        except Exception:
-            continue
+    for path in files:
+        if run_id is not None and path != pf:
+            header = segments.read_header(path)
+            if header is not None and run_id not in header.run_ids:
+                continue
+        for line in _iter_lines_reversed(path):
+            try:
+                rec = ProgressRecord(**json.loads(line))
+            except Exception:
+                continue
+            if _matches(rec, run_id, phase, status):
+                recs.append(rec)
+                if len(recs) >= n:
+                    recs.reverse()
+                    return recs
+    recs.reverse()
     return recs
 
 
+def follow(run_id: Optional[str] = None, phase: Optional[str] = None, status: Optional[str] = None,
+           poll_interval: float = 0.5, from_start: bool = False) -> Iterator[ProgressRecord]:
+    """Yield records as they are appended to the progress log (like ``tail -f``)."""
+    pf = _progress_file()
+    f = None
+    pending = b""
+    if pf.exists():
+        f = pf.open("rb")
+        if not from_start:
+            f.seek(0, os.SEEK_END)
+    try:
+        while True:
+            chunk = f.read() if f is not None else b""
+            if not chunk:
+                try:
+                    st = pf.stat()
+                except FileNotFoundError:
+                    st = None
+                if st is not None and (f is None or os.fstat(f.fileno()).st_ino != st.st_ino):
+                    # Rotated: the old handle is drained above, switch to the new file.
+                    if f is not None:
+                        f.close()
+                    f, pending = pf.open("rb"), b""
+                    continue
+                if st is not None and f is not None and st.st_size < f.tell():
+                    f.seek(0)
+                    pending = b""
+                    continue
+                time.sleep(poll_interval)
+                continue
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                try:
+                    rec = ProgressRecord(**json.loads(line))
+                except Exception:
+                    continue
+                if _matches(rec, run_id, phase, status):
+                    yield rec
+    finally:
+        if f is not None:
+            f.close()
+
+
+def _compact_summary(run_id: str, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    phases: Dict[str, Dict[str, Any]] = {}
+    for r in records:
+        p = phases.setdefault(r.get("phase", ""), {"records": 0, "errors": 0})
+        p["records"] += 1
+        p["errors"] += r.get("status") == "error"
+        p["last_step"] = r.get("step")
+        p["last_status"] = r.get("status")
+    errors = [r.get("message", "") for r in records if r.get("status") == "error"]
+    return {
+        "run_id": run_id,
+        "found": True,
+        "compacted": True,
+        "status": "error" if errors else "success",
+        "records": len(records),
+        "phases": phases,
+        "errors": errors,
+        "started_at": min(r.get("timestamp", 0.0) for r in records),
+        "finished_at": max(r.get("timestamp", 0.0) for r in records),
+    }
+
+
+def _find_compacted(run_id: str) -> Optional[Dict[str, Any]]:
+    for summary in reversed(segments.list_summaries(_progress_file())):
+        header = segments.read_header(summary)
+        if header is not None and run_id not in header.run_ids:
+            continue
+        for s in segments.iter_summaries(summary):
+            if s.get("run_id") == run_id:
+                return s
+    return None
+
+
 def summarize_run(run_id: str) -> Dict[str, Any]:
     records = read_run(run_id)
     if not records:
-        return {"run_id": run_id, "found": False}
+        return _find_compacted(run_id) or {"run_id": run_id, "found": False}
     phases: Dict[str, List[ProgressRecord]] = {}
     for r in records:
         phases.setdefault(r.phase, []).append(r)
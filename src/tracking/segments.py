@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+SEGMENT_DIR_NAME = "progress-segments"
+SEGMENT_SUFFIX = ".jsonl"
+SUMMARY_SUFFIX = ".summary.jsonl.gz"
+ROTATING_SUFFIX = ".rotating"
+CLAIM_SUFFIX = ".sealing"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SegmentHeader:
+    run_ids: List[str]
+    records: int
+    first_ts: float
+    last_ts: float
+
+
+def segment_dir(active: Path) -> Path:
+    return active.parent / SEGMENT_DIR_NAME
+
+
+def rotating_path(active: Path) -> Path:
+    # Same directory as the active file so the rename is atomic.
+    stamp = time.strftime("%Y%m%d%H%M%S")
+    return active.with_name(f"{active.name}.{stamp}-{uuid.uuid4().hex[:8]}{ROTATING_SUFFIX}")
+
+
+def _header_line(header: SegmentHeader) -> bytes:
+    return (json.dumps({"segment": asdict(header)}, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _parse_header(line: bytes) -> Optional[SegmentHeader]:
+    try:
+        obj = json.loads(line).get("segment")
+        return SegmentHeader(**obj) if obj else None
+    except Exception:
+        return None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        pass
+    return True
+
+
+def _rotating_name(name: str) -> str:
+    # "<x>.rotating.<pid>.sealing" -> "<x>.rotating"
+    if name.endswith(CLAIM_SUFFIX):
+        return name[:-len(CLAIM_SUFFIX)].rsplit(".", 1)[0]
+    return name
+
+
+def _claim(path: Path) -> Optional[Path]:
+    """Atomically take ownership of a rotated file by renaming it to ``<name>.<pid>.sealing``.
+
+    Exactly one of several concurrent sealers wins the rename; the others get
+    None and treat the file as already handled.
+    """
+    claimed = path.with_name(f"{_rotating_name(path.name)}.{os.getpid()}{CLAIM_SUFFIX}")
+    try:
+        os.rename(path, claimed)
+    except FileNotFoundError:
+        return None
+    return claimed
+
+
+def seal(rotating: Path, active: Path) -> Optional[Path]:
+    """Turn a rotated-out active file into a sealed segment with a run_id header.
+
+    Returns None if the file was empty or another process sealed it first.
+    """
+    claimed = _claim(rotating)
+    if claimed is None:
+        return None
+    try:
+        return _seal_claimed(claimed, _rotating_name(rotating.name), active)
+    except FileNotFoundError:
+        return None
+
+
+def _seal_claimed(claimed: Path, rotating_name: str, active: Path) -> Optional[Path]:
+    run_ids: Dict[str, None] = {}
+    count = 0
+    first_ts = last_ts = 0.0
+    with claimed.open("rb") as f:
+        for line in f:
+            try:
+                obj = json.loads(line)
+            except Exception:
+                continue
+            count += 1
+            run_ids.setdefault(obj.get("run_id", ""), None)
+            ts = float(obj.get("timestamp") or 0.0)
+            first_ts = ts if count == 1 else min(first_ts, ts)
+            last_ts = max(last_ts, ts)
+    if count == 0:
+        claimed.unlink()
+        return None
+    out_dir = segment_dir(active)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d%H%M%S", time.localtime(first_ts))
+    suffix = rotating_name[len(active.name) + 1:-len(ROTATING_SUFFIX)]
+    final = out_dir / f"{active.stem}-{stamp}-{suffix}{SEGMENT_SUFFIX}"
+    tmp = final.with_name(f"{final.name}.{os.getpid()}.tmp")
+    header = SegmentHeader(run_ids=[r for r in run_ids if r], records=count, first_ts=first_ts, last_ts=last_ts)
+    with claimed.open("rb") as src, tmp.open("wb") as dst:
+        dst.write(_header_line(header))
+        for block in iter(lambda: src.read(1024 * 1024), b""):
+            dst.write(block)
+    os.replace(tmp, final)
+    claimed.unlink()
+    return final
+
+
+def seal_pending(active: Path) -> List[Path]:
+    """Finish rotations interrupted by a crash between rename and seal; never raises."""
+    candidates = sorted(active.parent.glob(f"{active.name}.*{ROTATING_SUFFIX}"))
+    for claimed in sorted(active.parent.glob(f"{active.name}.*{CLAIM_SUFFIX}")):
+        # Claims left behind by a sealer that died; live ones belong to whoever holds them.
+        pid = claimed.name[:-len(CLAIM_SUFFIX)].rsplit(".", 1)[-1]
+        if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+            candidates.append(claimed)
+    sealed = []
+    for path in candidates:
+        try:
+            out = seal(path, active)
+        except OSError as e:
+            logger.warning("Could not seal progress segment %s: %s", path, e)
+            continue
+        if out is not None:
+            sealed.append(out)
+    return sealed
+
+
+def list_segments(active: Path) -> List[Path]:
+    d = segment_dir(active)
+    if not d.exists():
+        return []
+    return sorted(p for p in d.iterdir() if p.name.endswith(SEGMENT_SUFFIX))
+
+
+def list_summaries(active: Path) -> List[Path]:
+    d = segment_dir(active)
+    if not d.exists():
+        return []
+    return sorted(p for p in d.iterdir() if p.name.endswith(SUMMARY_SUFFIX))
+
+
+_headers: Dict[Path, Tuple[int, Optional[SegmentHeader]]] = {}
+
+
+def read_header(path: Path) -> Optional[SegmentHeader]:
+    # Segments are immutable once sealed, so the header is cached per mtime.
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _headers.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    opener = gzip.open if path.name.endswith(SUMMARY_SUFFIX) else open
+    with opener(path, "rb") as f:
+        header = _parse_header(f.readline())
+    _headers[path] = (mtime, header)
+    return header
+
+
+def compact(segment: Path, summarize: Callable[[str, List[Dict[str, Any]]], Dict[str, Any]]) -> Optional[Path]:
+    """Replace a sealed segment with a gzip JSONL of per-run summaries (same header).
+
+    Returns None if another process compacted the segment first.
+    """
+    header = read_header(segment)
+    runs: Dict[str, List[Dict[str, Any]]] = {}
+    try:
+        f = segment.open("rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        f.readline()
+        for line in f:
+            try:
+                obj = json.loads(line)
+            except Exception:
+                continue
+            runs.setdefault(obj.get("run_id", ""), []).append(obj)
+    out = segment.with_name(segment.name[:-len(SEGMENT_SUFFIX)] + SUMMARY_SUFFIX)
+    tmp = out.with_name(f"{out.name}.{os.getpid()}.tmp")
+    with gzip.open(tmp, "wb") as f:
+        if header is not None:
+            f.write(_header_line(header))
+        for run_id, recs in runs.items():
+            f.write((json.dumps(summarize(run_id, recs), ensure_ascii=False) + "\n").encode("utf-8"))
+    os.replace(tmp, out)
+    try:
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+    _headers.pop(segment, None)
+    return out
+
+
+def iter_summaries(path: Path) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, "rb") as f:
+        f.readline()
+        for line in f:
+            try:
+                yield json.loads(line)
+            except Exception:
+                continue
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import multiprocessing.util
+import os
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional
+
+try:  # POSIX only; on Windows we rely on O_APPEND alone.
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressWriter:
+    """Append-only line writer that keeps its file descriptor open.
+
+    In buffered mode lines are queued and written in batches by a daemon
+    thread every ``flush_interval`` seconds (or as soon as ``max_batch`` lines
+    are pending) and once more at interpreter exit. Each batch goes out as a
+    single ``write`` on an ``O_APPEND`` descriptor under an exclusive
+    ``flock``, so records from concurrent processes never interleave
+    mid-line. ``sync=True`` writes every line immediately, which is what tests
+    and short-lived scripts want.
+
+    After each batch ``should_rotate(fd)`` is asked (still under the lock)
+    whether the file is due for rotation; if so it is renamed via
+    ``rotate_to(path)`` and ``on_rotate`` receives the renamed file once the
+    lock is released. Writers re-check the inode after locking, so nothing
+    is appended to a file that has been rotated away.
+
+    A batch that fails to write goes back to the front of the queue and is
+    retried with the next flush; only when more than ``max_pending`` lines
+    pile up are the oldest dropped, counted in ``dropped`` and logged.
+    """
+
+    def __init__(self, path: Path, sync: bool = False, flush_interval: float = 0.5, max_batch: int = 256,
+                 max_pending: int = 65536,
+                 should_rotate: Optional[Callable[[int], bool]] = None,
+                 rotate_to: Optional[Callable[[Path], Path]] = None,
+                 on_rotate: Optional[Callable[[Path], None]] = None) -> None:
+        self.path = path
+        self.sync = sync
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.should_rotate = should_rotate
+        self.rotate_to = rotate_to
+        self.on_rotate = on_rotate
+        self._fd: Optional[int] = None
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        atexit.register(self.close)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def write(self, line: str) -> None:
+        if self.sync or self._closed:
+            with self._lock:
+                self._pending.append(line)
+            self.flush()
+            return
+        with self._lock:
+            self._pending.append(line)
+            full = len(self._pending) >= self.max_batch
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def flush(self) -> None:
+        # Holding the I/O lock across take-and-write keeps batches in order.
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    self._requeue(batch, e)
+
+    def _requeue(self, batch: List[str], error: Exception) -> None:
+        # Caller holds self._io_lock; the batch goes back in front of anything queued since.
+        with self._lock:
+            self._pending = batch + self._pending
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                del self._pending[:overflow]
+                self.dropped += overflow
+            pending = len(self._pending)
+        logger.warning("Progress write to %s failed (%s); %d records queued for retry, %d dropped so far",
+                       self.path, error, pending, self.dropped)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self.flush()
+        with self._lock:
+            lost, self._pending = len(self._pending), []
+        if lost:
+            self.dropped += lost
+            logger.error("Dropped %d progress records that could not be written to %s", lost, self.path)
+        with self._io_lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+            self._thread.start()
+            # multiprocessing children leave via os._exit() and skip atexit,
+            # but they do run finalizers registered after they started.
+            multiprocessing.util.Finalize(self, self.flush, exitpriority=100)
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Never let a logging failure kill the flusher; the next batch retries.
+                pass
+
+    def _open(self) -> int:
+        # Reopen if the log was rotated or removed underneath us.
+        if self._fd is not None:
+            try:
+                if os.fstat(self._fd).st_ino == os.stat(self.path).st_ino:
+                    return self._fd
+            except FileNotFoundError:
+                pass
+            os.close(self._fd)
+            self._fd = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(str(self.path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._fd
+
+    def _lock_current(self) -> int:
+        while True:
+            fd = self._open()
+            if fcntl is None:
+                return fd
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            # Rotated while we waited for the lock; reopen and try again.
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+            self._fd = None
+
+    def _write_batch(self, lines: List[str], force_rotate: bool = False) -> None:
+        # Caller holds self._io_lock.
+        data = "".join(lines).encode("utf-8")
+        rotated: Optional[Path] = None
+        fd = self._lock_current()
+        try:
+            view = memoryview(data)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+            if self.rotate_to is not None and (force_rotate or (self.should_rotate and self.should_rotate(fd))):
+                try:
+                    rotated = self.rotate_to(self.path)
+                    os.replace(self.path, rotated)
+                except OSError:
+                    # e.g. Windows refusing to rename a file another process holds open.
+                    rotated = None
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        if rotated is not None and self.on_rotate is not None:
+            # The batch is already on disk; a sealing failure must not make the caller retry it.
+            try:
+                self.on_rotate(rotated)
+            except Exception:
+                logger.exception("Post-rotation hook failed for %s", rotated)
+
+    def rotate(self) -> None:
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            try:
+                self._write_batch(batch, force_rotate=True)
+            except Exception as e:
+                self._requeue(batch, e)
+
+    def _after_fork(self) -> None:
+        # The flusher thread does not survive fork and the parent owns the
+        # pending lines; start the child clean.
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = []
+        self._thread = None
+        self._closed = False
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
@@ -1,28 +1,492 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
+import multiprocessing.util
+import os
+import pickle
+import re
+import shutil
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Any, Callable, Optional
-from diskcache import Cache
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+from diskcache import Cache, Disk
+from diskcache.core import UNKNOWN
 
-from src.config import ensure_output_dir
+from src.config import config, ensure_output_dir
 
 
-_cache: Optional[Cache] = None
+_MISSING = object()
+LEASE_PREFIX = "__lease__:"
+DEFAULT_NAMESPACE = "default"
+MB = 1024 * 1024
 
 
-def get_cache() -> Cache:
-    global _cache
-    if _cache is None:
-        base = Path(ensure_output_dir()) / ".cache"
+@dataclass(frozen=True)
+class CacheNamespace:
+    name: str
+    size_limit: int
+    eviction_policy: str = "least-recently-used"
+    expire: Optional[int] = 24 * 3600
+    compress: bool = False
+
+
+# OCR text is small but expensive to recompute, renders are large and cheap to
+# redo, API results go stale quickly, grammar matches are per paragraph, TTS
+# segments are large files, brain posts are reused for a week. Each can be
+# overridden with CACHE_<NAME>_SIZE_MB / CACHE_<NAME>_TTL / CACHE_<NAME>_POLICY / CACHE_<NAME>_COMPRESS.
+NAMESPACES: Dict[str, CacheNamespace] = {
+    "default": CacheNamespace("default", 256 * MB, "least-recently-stored", 24 * 3600),
+    "ocr": CacheNamespace("ocr", 256 * MB, "least-recently-used", 30 * 24 * 3600, compress=True),
+    "render": CacheNamespace("render", 1024 * MB, "least-recently-used", 7 * 24 * 3600),
+    "api": CacheNamespace("api", 64 * MB, "least-recently-stored", 3600, compress=True),
+    "grammar": CacheNamespace("grammar", 128 * MB, "least-recently-used", 30 * 24 * 3600, compress=True),
+    "tts": CacheNamespace("tts", 2048 * MB, "least-recently-used", 90 * 24 * 3600),
+    "brain": CacheNamespace("brain", 64 * MB, "least-recently-used", 7 * 24 * 3600, compress=True),
+}
+
+
+def _namespace(name: str) -> CacheNamespace:
+    ns = NAMESPACES.get(name) or replace(NAMESPACES[DEFAULT_NAMESPACE], name=name)
+    prefix = f"CACHE_{name.upper()}_"
+    overrides: Dict[str, Any] = {}
+    if os.getenv(prefix + "SIZE_MB"):
+        overrides["size_limit"] = int(float(os.environ[prefix + "SIZE_MB"]) * MB)
+    if os.getenv(prefix + "TTL"):
+        overrides["expire"] = int(os.environ[prefix + "TTL"]) or None
+    if os.getenv(prefix + "POLICY"):
+        overrides["eviction_policy"] = os.environ[prefix + "POLICY"]
+    if os.getenv(prefix + "COMPRESS"):
+        overrides["compress"] = os.environ[prefix + "COMPRESS"].lower() in {"1", "true", "yes"}
+    return replace(ns, **overrides) if overrides else ns
+
+
+class CompressedDisk(Disk):
+    """diskcache Disk that stores values as zlib-compressed pickles."""
+
+    def __init__(self, directory: str, compress_level: int = 6, **kwargs: Any) -> None:
+        self.compress_level = compress_level
+        super().__init__(directory, **kwargs)
+
+    def store(self, value: Any, read: bool, key: Any = UNKNOWN) -> Any:
+        if not read:
+            value = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), self.compress_level)
+        return super().store(value, read, key=key)
+
+    def fetch(self, mode: int, filename: str, value: Any, read: bool) -> Any:
+        data = super().fetch(mode, filename, value, read)
+        if not read:
+            data = pickle.loads(zlib.decompress(data))
+        return data
+
+
+def _cache_root() -> Path:
+    return Path(ensure_output_dir()) / ".cache"
+
+
+_caches: Dict[str, Cache] = {}
+_caches_guard = threading.Lock()
+
+
+def get_cache(namespace: str = DEFAULT_NAMESPACE) -> Cache:
+    c = _caches.get(namespace)
+    if c is None:
+        with _caches_guard:
+            c = _caches.get(namespace)
+            if c is None:
+                ns = _namespace(namespace)
+                base = _cache_root() / namespace
+                base.mkdir(parents=True, exist_ok=True)
+                # cull_limit=0: we cull ourselves after writes so evictions can be counted.
+                c = _caches[namespace] = Cache(
+                    str(base),
+                    disk=CompressedDisk if ns.compress else Disk,
+                    size_limit=ns.size_limit,
+                    eviction_policy=ns.eviction_policy,
+                    cull_limit=0,
+                )
+    return c
+
+
+class _Stats:
+    """Hit/miss/eviction counters kept in memory and added to a shared
+    diskcache at exit (or every ``flush_every`` events) so hits stay write-free."""
+
+    FIELDS = ("memory_hits", "disk_hits", "misses", "evictions")
+
+    def __init__(self, flush_every: int = 1000) -> None:
+        self.flush_every = flush_every
+        self._counts: Dict[Tuple[str, str], int] = {}
+        self._events = 0
+        self._lock = threading.Lock()
+        self._finalizer_pid: Optional[int] = None
+
+    def add(self, namespace: str, field: str, n: int = 1) -> None:
+        if n <= 0:
+            return
+        with self._lock:
+            self._counts[(namespace, field)] = self._counts.get((namespace, field), 0) + n
+            self._events += n
+            due = self._events >= self.flush_every
+            if self._finalizer_pid != os.getpid():
+                # multiprocessing children skip atexit but run finalizers.
+                self._finalizer_pid = os.getpid()
+                multiprocessing.util.Finalize(self, self.flush, exitpriority=100)
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            counts, self._counts, self._events = self._counts, {}, 0
+        if not counts:
+            return
+        store = _stats_store()
+        for (namespace, field), n in counts.items():
+            store.incr(f"{namespace}:{field}", n)
+
+    def totals(self, namespace: str) -> Dict[str, int]:
+        self.flush()
+        store = _stats_store()
+        return {f: int(store.get(f"{namespace}:{f}", 0)) for f in self.FIELDS}
+
+    def reset(self, namespace: str) -> None:
+        with self._lock:
+            for f in self.FIELDS:
+                self._counts.pop((namespace, f), None)
+        store = _stats_store()
+        for f in self.FIELDS:
+            store.delete(f"{namespace}:{f}")
+
+
+_stats = _Stats()
+_stats_cache: Optional[Cache] = None
+
+
+def _stats_store() -> Cache:
+    global _stats_cache
+    if _stats_cache is None:
+        base = _cache_root() / "_stats"
         base.mkdir(parents=True, exist_ok=True)
-        _cache = Cache(str(base))
-    return _cache
+        _stats_cache = Cache(str(base), eviction_policy="none")
+    return _stats_cache
+
+
+atexit.register(_stats.flush)
+
+
+class _MemoryLRU:
+    """Small in-process LRU in front of diskcache so hot keys skip SQLite."""
+
+    def __init__(self, max_items: int) -> None:
+        self.max_items = max_items
+        self._data: "OrderedDict[Tuple[str, str], Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Tuple[str, str], value: Any, expires_at: Optional[float]) -> None:
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        with self._lock:
+            if namespace is None:
+                self._data.clear()
+            else:
+                for k in [k for k in self._data if k[0] == namespace]:
+                    del self._data[k]
+
+
+_memory = _MemoryLRU(config.cache_memory_items)
+_key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_key_locks_guard = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    # SQLite connections must not cross fork; the child reopens lazily.
+    global _stats_cache, _key_locks_guard, _caches_guard
+    _caches.clear()
+    _stats_cache = None
+    _key_locks.clear()
+    _key_locks_guard = threading.Lock()
+    _caches_guard = threading.Lock()
+    _memory._lock = threading.Lock()
+    _stats._lock = threading.Lock()
+    _stats._counts, _stats._events = {}, 0
+
 
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
 
-def memoize(key: str, creator: Callable[[], Any], expire: int = 24 * 3600) -> Any:
-    c = get_cache()
-    if key in c:
-        return c[key]
-    value = creator()
+
+def _lookup(namespace: str, key: str) -> Tuple[bool, Any]:
+    value = _memory.get((namespace, key))
+    if value is not _MISSING:
+        _stats.add(namespace, "memory_hits")
+        return True, value
+    # One SQLite round-trip instead of `key in c` followed by `c[key]`.
+    value, expire_time = get_cache(namespace).get(key, default=_MISSING, expire_time=True)
+    if value is _MISSING:
+        return False, None
+    _stats.add(namespace, "disk_hits")
+    _memory.set((namespace, key), value, expire_time)
+    return True, value
+
+
+def _cull(namespace: str, c: Cache) -> int:
+    if c.volume() <= c.size_limit:
+        return 0
+    removed = c.cull()
+    _stats.add(namespace, "evictions", removed)
+    return removed
+
+
+def _expire_for(namespace: str, expire: Optional[int]) -> Optional[int]:
+    return _namespace(namespace).expire if expire is None else (expire or None)
+
+
+def _store(namespace: str, key: str, value: Any, expire: Optional[int]) -> None:
+    c = get_cache(namespace)
     c.set(key, value, expire=expire)
-    return value
+    _cull(namespace, c)
+    _memory.set((namespace, key), value, time.time() + expire if expire else None)
+
+
+def _acquire_lease(namespace: str, key: str, token: str, lease: float) -> bool:
+    # diskcache.add is atomic across processes: only one caller wins the lease.
+    return get_cache(namespace).add(LEASE_PREFIX + key, token, expire=lease)
+
+
+def _release_lease(namespace: str, key: str, token: str) -> None:
+    c = get_cache(namespace)
+    with c.transact():
+        if c.get(LEASE_PREFIX + key) == token:
+            c.delete(LEASE_PREFIX + key)
+
+
+def _key_lock(namespace: str, key: str) -> threading.Lock:
+    with _key_locks_guard:
+        lock = _key_locks.get((namespace, key))
+        if lock is None:
+            lock = _key_locks[(namespace, key)] = threading.Lock()
+        return lock
+
+
+def memoize(key: str, creator: Callable[[], Any], expire: Optional[int] = None, lease: float = 300.0,
+            namespace: str = DEFAULT_NAMESPACE) -> Any:
+    """Return the cached value for ``key`` or compute it exactly once.
+
+    Lookups go memory LRU -> diskcache. On a miss, threads in this process
+    queue on a per-key lock and processes compete for a diskcache lease
+    (expiring after ``lease`` seconds in case the holder dies); only the
+    winner runs ``creator`` while the rest poll for its result. ``expire``
+    defaults to the namespace TTL; pass 0 to keep the value until evicted.
+    """
+    found, value = _lookup(namespace, key)
+    if found:
+        return value
+    expire = _expire_for(namespace, expire)
+    lock = _key_lock(namespace, key)
+    with lock:
+        try:
+            found, value = _lookup(namespace, key)
+            if found:
+                return value
+            token = uuid.uuid4().hex
+            delay = 0.05
+            while True:
+                if _acquire_lease(namespace, key, token, lease):
+                    try:
+                        _stats.add(namespace, "misses")
+                        value = creator()
+                        _store(namespace, key, value, expire)
+                        return value
+                    finally:
+                        _release_lease(namespace, key, token)
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+                found, value = _lookup(namespace, key)
+                if found:
+                    return value
+        finally:
+            with _key_locks_guard:
+                if _key_locks.get((namespace, key)) is lock:
+                    del _key_locks[(namespace, key)]
+
+
+async def amemoize(key: str, creator: Callable[[], Awaitable[Any]], expire: Optional[int] = None,
+                   lease: float = 300.0, namespace: str = DEFAULT_NAMESPACE) -> Any:
+    """``memoize`` for coroutines; diskcache I/O runs in a worker thread."""
+    value = _memory.get((namespace, key))
+    if value is not _MISSING:
+        _stats.add(namespace, "memory_hits")
+        return value
+    found, value = await asyncio.to_thread(_lookup, namespace, key)
+    if found:
+        return value
+    expire = _expire_for(namespace, expire)
+    token = uuid.uuid4().hex
+    delay = 0.05
+    while True:
+        if await asyncio.to_thread(_acquire_lease, namespace, key, token, lease):
+            try:
+                _stats.add(namespace, "misses")
+                value = await creator()
+                await asyncio.to_thread(_store, namespace, key, value, expire)
+                return value
+            finally:
+                await asyncio.to_thread(_release_lease, namespace, key, token)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
+        found, value = await asyncio.to_thread(_lookup, namespace, key)
+        if found:
+            return value
+
+
+def get_many(keys: Iterable[str], namespace: str = DEFAULT_NAMESPACE) -> Dict[str, Any]:
+    """Return the cached entries among ``keys``; misses are simply absent."""
+    result: Dict[str, Any] = {}
+    pending: List[str] = []
+    for key in keys:
+        value = _memory.get((namespace, key))
+        if value is _MISSING:
+            pending.append(key)
+        else:
+            result[key] = value
+    _stats.add(namespace, "memory_hits", len(result))
+    if pending:
+        c = get_cache(namespace)
+        hits = 0
+        with c.transact():
+            for key in pending:
+                value, expire_time = c.get(key, default=_MISSING, expire_time=True)
+                if value is not _MISSING:
+                    hits += 1
+                    result[key] = value
+                    _memory.set((namespace, key), value, expire_time)
+        _stats.add(namespace, "disk_hits", hits)
+        _stats.add(namespace, "misses", len(pending) - hits)
+    return result
+
+
+def set_many(items: Dict[str, Any], expire: Optional[int] = None, namespace: str = DEFAULT_NAMESPACE) -> None:
+    expire = _expire_for(namespace, expire)
+    c = get_cache(namespace)
+    with c.transact():
+        for key, value in items.items():
+            c.set(key, value, expire=expire)
+    _cull(namespace, c)
+    expires_at = time.time() + expire if expire else None
+    for key, value in items.items():
+        _memory.set((namespace, key), value, expires_at)
+
+
+def put_file(key: str, path: Path, expire: Optional[int] = None, namespace: str = DEFAULT_NAMESPACE,
+             tag: Any = None) -> None:
+    """Store the bytes of ``path`` under ``key``, streamed; diskcache keeps large values as files.
+
+    ``tag`` is a small value kept in the same entry, so it is evicted together with the bytes.
+    """
+    c = get_cache(namespace)
+    with open(path, "rb") as f:
+        c.set(key, f, read=True, expire=_expire_for(namespace, expire), tag=tag)
+    _cull(namespace, c)
+
+
+def file_tags(keys: Iterable[str], namespace: str = DEFAULT_NAMESPACE) -> Dict[str, Any]:
+    """Tags of the :func:`put_file` entries among ``keys`` that are present; misses are left out."""
+    c = get_cache(namespace)
+    found: Dict[str, Any] = {}
+    for key in keys:
+        f, tag = c.get(key, default=None, read=True, tag=True)
+        _stats.add(namespace, "disk_hits" if f is not None else "misses")
+        if f is not None:
+            f.close()
+            found[key] = tag
+    return found
+
+
+def open_file(key: str, namespace: str = DEFAULT_NAMESPACE) -> Optional[BinaryIO]:
+    """Open a value stored with :func:`put_file` for reading, or return None on a miss."""
+    f = get_cache(namespace).get(key, default=None, read=True)
+    _stats.add(namespace, "disk_hits" if f is not None else "misses")
+    return f
+
+
+def namespaces() -> List[str]:
+    # Configured namespaces plus any created ad hoc (skipping diskcache's own
+    # two-hex-digit shard dirs left by the pre-namespace cache).
+    root = _cache_root()
+    on_disk = {p.name for p in root.iterdir() if p.is_dir()} if root.exists() else set()
+    on_disk = {n for n in on_disk if not n.startswith("_") and not re.fullmatch(r"[0-9a-f]{2}", n)}
+    return sorted(set(NAMESPACES) | on_disk)
+
+
+def cache_stats(namespace: str) -> Dict[str, Any]:
+    ns = _namespace(namespace)
+    c = get_cache(namespace)
+    totals = _stats.totals(namespace)
+    hits = totals["memory_hits"] + totals["disk_hits"]
+    lookups = hits + totals["misses"]
+    return {
+        "namespace": namespace,
+        "entries": len(c),
+        "volume": c.volume(),
+        "size_limit": ns.size_limit,
+        "eviction_policy": ns.eviction_policy,
+        "ttl": ns.expire,
+        "compress": ns.compress,
+        **totals,
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+    }
+
+
+def prune_cache(namespace: str) -> int:
+    # Drop expired entries, then evict by policy down to the size limit.
+    c = get_cache(namespace)
+    removed = c.expire()
+    _stats.add(namespace, "evictions", removed)
+    return removed + _cull(namespace, c)
+
+
+def clear_cache(namespace: str) -> int:
+    removed = get_cache(namespace).clear()
+    _memory.clear(namespace)
+    _stats.reset(namespace)
+    return removed
+
+
+def clear_legacy_cache() -> int:
+    # Entries written before namespaces lived directly under .cache/.
+    root = _cache_root()
+    if not (root / "cache.db").exists():
+        return 0
+    legacy = Cache(str(root))
+    removed = legacy.clear()
+    legacy.close()
+    for name in ("cache.db", "cache.db-wal", "cache.db-shm"):
+        (root / name).unlink(missing_ok=True)
+    for sub in root.iterdir():
+        if sub.is_dir() and re.fullmatch(r"[0-9a-f]{2}", sub.name):
+            shutil.rmtree(sub, ignore_errors=True)
+    return removed
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config import config
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide keep-alive session for the posting APIs.
+
+    Facebook and WordPress calls share its connection pool
+    (``HTTP_POOL_SIZE`` per host), so a batch of campaigns reuses TLS
+    connections instead of opening one per post.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=config.http_pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
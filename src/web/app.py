@@ -1,18 +1,59 @@
 from __future__ import annotations
 
-from flask import Flask, render_template, request, send_file, redirect, url_for, send_from_directory
+from flask import (
+    Flask, Response, abort, jsonify, render_template, request, send_file, redirect, stream_with_context, url_for,
+    send_from_directory,
+)
 from io import BytesIO
+from werkzeug.security import safe_join
+from dataclasses import asdict
 from pathlib import Path
+import json
 import tempfile
+import time
 
 from src.config import config, ensure_output_dir
-from src.cover.generate import generate_cover, generate_tshirt_design
-from src.marketing.details import generate_book_cover_details, generate_tshirt_details
+from src.tracking.progress import prometheus_metrics, share_metrics
+from src.web.assets import DIGEST_SUFFIX, IMMUTABLE_MAX_AGE, asset_etag, is_hashed
+from src.web.jobs import QueueFull, RenderJob, render_queue
+from src.web.preview import render_preview
+from src.grammar.check import get_checker
+from src.web.batch import parse_items, stream_zip
+from src.web.uploads import is_image, store_stream
+from src.web.warmup import warm_up
+from src.ocr.extract import ocr_cache_key
+from src.utils.cache import get_many
+
+
+# Job kinds clients may submit directly, with the fields each accepts.
+WEB_JOB_FIELDS = {
+    "cover": ("title", "author", "quote"),
+    "tshirt": ("title", "author", "text"),
+}
+
+
+def _job_payload(job: RenderJob) -> dict:
+    payload = {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "status_url": url_for("job_status", job_id=job.id),
+        "events_url": url_for("job_events", job_id=job.id),
+    }
+    if job.output:
+        payload["url"] = url_for("serve_file", filename=job.output)
+    if job.details:
+        payload["details"] = job.details
+    if job.error:
+        payload["error"] = job.error
+    return payload
 
 
 def create_app() -> Flask:
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config["MAX_CONTENT_LENGTH"] = 32 * 1024 * 1024
+    # The designer polls GET /jobs/<id> unless SSE is enabled (WEB_JOB_EVENTS).
+    app.jinja_env.globals["job_events"] = config.web_job_events
 
     @app.get("/")
     def index():
@@ -22,9 +63,33 @@ def create_app() -> Flask:
     def designer():
         return render_template("designer.html")
 
+    @app.get("/ready")
+    def ready():
+        state = app.extensions["warmup"]
+        return jsonify(state.as_dict()), 200 if state.ready else 503
+
+    # Workers publish their histograms to a shared directory; a scrape sums them all.
+    share_metrics()
+
+    @app.get("/metrics")
+    def metrics():
+        return Response(prometheus_metrics(), mimetype="text/plain; version=0.0.4")
+
     @app.get("/files/<path:filename>")
     def serve_file(filename: str):
-        return send_from_directory(ensure_output_dir(), filename)
+        root = ensure_output_dir()
+        full = safe_join(root, filename)
+        if full is None or filename.endswith(DIGEST_SUFFIX):
+            abort(404)
+        etag = asset_etag(Path(full))
+        hashed = is_hashed(filename)
+        # conditional=True gives If-None-Match -> 304 and Range -> 206 handling;
+        # without max_age the response is no-cache, i.e. always revalidated.
+        resp = send_from_directory(root, filename, etag=etag or True, conditional=True,
+                                   max_age=IMMUTABLE_MAX_AGE if hashed else None)
+        if hashed:
+            resp.cache_control.immutable = True
+        return resp
 
     @app.post("/export")
     def export_text():
@@ -33,39 +98,150 @@ def create_app() -> Flask:
         buf.seek(0)
         return send_file(buf, as_attachment=True, download_name="edited.txt", mimetype="text/plain")
 
+    @app.post("/grammar")
+    def grammar():
+        # Unchanged paragraphs are answered from the grammar cache, so re-checks after an edit are cheap.
+        data = request.get_json(silent=True) or request.form
+        try:
+            result = get_checker().check(str(data.get("text", "")))
+        except Exception as e:
+            return jsonify({"error": str(e) or type(e).__name__}), 502
+        return jsonify({
+            "corrected_text": result.corrected_text,
+            "matches": [asdict(m) for m in result.matches],
+            "paragraphs": result.paragraphs,
+            "cached": result.cached,
+        })
+
+    def _submit(kind: str) -> RenderJob:
+        data = request.get_json(silent=True) or request.form
+        return render_queue.submit(kind, {k: str(data.get(k, "")) for k in WEB_JOB_FIELDS[kind]})
+
     @app.post("/make/cover")
     def make_cover():
-        title = request.form.get("title", "")
-        author = request.form.get("author", "")
-        quote = request.form.get("quote", "")
-        out_dir = Path(ensure_output_dir())
-        out_path = out_dir / "web_cover.png"
-        generate_cover(title, author, quote, out_path)
-        details = generate_book_cover_details(title, author, quote)
-        cover_url = url_for("serve_file", filename=out_path.name)
-        return render_template("designer.html", cover_url=cover_url, details=details)
+        try:
+            job = _submit("cover")
+        except QueueFull as e:
+            return render_template("designer.html", error=str(e)), 503
+        return render_template("designer.html", job=_job_payload(job))
 
     @app.post("/make/tshirt")
     def make_tshirt():
-        title = request.form.get("title", "")
-        text = request.form.get("text", "")
-        author = request.form.get("author", "")
-        out_dir = Path(ensure_output_dir())
-        out_path = out_dir / "web_tshirt.png"
-        generate_tshirt_design(text=text, out_path=out_path, title=title or None)
-        details = generate_tshirt_details(title, author, text)
-        tshirt_url = url_for("serve_file", filename=out_path.name)
-        return render_template("designer.html", tshirt_url=tshirt_url, details=details)
-
-    @app.post("/upload")
+        try:
+            job = _submit("tshirt")
+        except QueueFull as e:
+            return render_template("designer.html", error=str(e)), 503
+        return render_template("designer.html", job=_job_payload(job))
+
+    @app.post("/jobs/<kind>")
+    def submit_job(kind: str):
+        if kind not in WEB_JOB_FIELDS:
+            abort(404)
+        try:
+            job = _submit(kind)
+        except QueueFull as e:
+            return jsonify({"error": str(e)}), 503
+        return jsonify(_job_payload(job)), 202
+
+    @app.get("/preview/<kind>")
+    def preview(kind: str):
+        # Reduced-scale WebP for live designer feedback; /make/* and /batch render full size.
+        if kind not in WEB_JOB_FIELDS:
+            abort(404)
+        params = {k: request.args.get(k, "") for k in WEB_JOB_FIELDS[kind]}
+        etag, data = render_preview(kind, params, request.args.get("scale", type=float))
+        resp = Response(data, mimetype="image/webp")
+        resp.set_etag(etag)
+        resp.cache_control.max_age = 3600
+        return resp.make_conditional(request)
+
+    @app.post("/batch")
+    def batch():
+        # {"items": [{"kind": "cover", "title": ..., "author": ..., "quote": ...}, ...]} -> ZIP stream
+        data = request.get_json(silent=True)
+        specs = data.get("items") if isinstance(data, dict) else data
+        if not isinstance(specs, list) or not specs:
+            return jsonify({"error": "Expected a non-empty list of items"}), 400
+        if len(specs) > config.batch_max_items:
+            return jsonify({"error": f"At most {config.batch_max_items} items per batch"}), 413
+        try:
+            items = parse_items(specs, WEB_JOB_FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        # Batch renders share the render queue's pool and count against RENDER_MAX_PENDING.
+        workers = min(len(items), config.render_workers)
+        try:
+            release = render_queue.reserve(workers)
+        except QueueFull as e:
+            return jsonify({"error": str(e)}), 503
+        resp = Response(stream_zip(items, workers=workers, executor=render_queue.executor()),
+                        mimetype="application/zip", headers={"Content-Disposition": "attachment; filename=batch.zip"})
+        resp.call_on_close(release)
+        return resp
+
+    @app.get("/jobs/<job_id>")
+    def job_status(job_id: str):
+        job = render_queue.get(job_id)
+        if job is None:
+            abort(404)
+        return jsonify(_job_payload(job))
+
+    @app.get("/jobs/<job_id>/events")
+    def job_events(job_id: str):
+        job = render_queue.get(job_id)
+        if job is None:
+            abort(404)
+
+        @stream_with_context
+        def stream():
+            last = None
+            current = job
+            deadline = time.monotonic() + 300
+            while current is not None and time.monotonic() < deadline:
+                if current.status != last:
+                    last = current.status
+                    yield f"event: status\ndata: {json.dumps(_job_payload(current))}\n\n"
+                if current.finished:
+                    return
+                time.sleep(0.25)
+                current = render_queue.get(job_id)
+
+        return Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    @app.route("/upload", methods=["POST", "PUT"])
     def upload():
-        f = request.files.get("file")
-        if not f:
-            return redirect(url_for("designer"))
-        out_dir = Path(ensure_output_dir())
-        dest = out_dir / f.filename
-        f.save(dest)
-        uploaded_url = url_for("serve_file", filename=dest.name)
-        return render_template("designer.html", upload_url=uploaded_url)
+        # Multipart form posts from the designer, or a raw request body
+        # (PUT /upload?filename=page.png) that is streamed straight to disk.
+        if request.mimetype == "multipart/form-data":
+            f = request.files.get("file")
+            if not f:
+                return redirect(url_for("designer"))
+            stored = store_stream(f.stream, f.filename or "")
+            wants_json = request.accept_mimetypes.best == "application/json"
+        else:
+            stored = store_stream(request.stream, request.args.get("filename", ""))
+            wants_json = True
+        payload = {
+            "sha256": stored.sha256,
+            "size": stored.size,
+            "deduplicated": not stored.created,
+            "url": url_for("serve_file", filename=stored.path.as_posix()),
+        }
+        if request.values.get("ocr") in {"1", "true", "on"} and is_image(stored):
+            # Identical images reuse the OCR cache entry keyed by the same sha256.
+            cached = get_many([ocr_cache_key(stored.sha256)], namespace="ocr")
+            if cached:
+                payload["ocr"] = {"text": next(iter(cached.values())), "cached": True}
+            else:
+                try:
+                    job = render_queue.submit("ocr", {"path": stored.path.as_posix(), "sha256": stored.sha256})
+                    payload["ocr"] = {"job": _job_payload(job)}
+                except QueueFull as e:
+                    payload["ocr"] = {"error": str(e)}
+        if wants_json:
+            return jsonify(payload), 201 if stored.created else 200
+        return render_template("designer.html", upload=payload, upload_url=payload["url"],
+                               job=payload.get("ocr", {}).get("job"))
 
+    app.extensions["warmup"] = warm_up(app, config.web_warmup)
     return app
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+
+HASH_LEN = 16
+# "<stem>.<16 hex>.<ext>" from publish(), or a bare "<64 hex>.<ext>" from the upload store.
+HASHED_NAME_RE = re.compile(r"(?:^|\.)([0-9a-f]{%d}(?:[0-9a-f]{48})?)\.[A-Za-z0-9]+$" % HASH_LEN)
+DIGEST_SUFFIX = ".sha256"
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def publish(path: Path, digest: Optional[str] = None) -> Path:
+    """Rename a freshly rendered file to ``<stem>.<hash>.<ext>`` and record its digest.
+
+    Called once at render time so requests never hash: a hashed name is its
+    own strong ETag and can be cached as immutable.
+    """
+    digest = digest or file_sha256(path)
+    hashed = path.with_name(f"{path.stem}.{digest[:HASH_LEN]}{path.suffix}")
+    os.replace(path, hashed)
+    hashed.with_name(hashed.name + DIGEST_SUFFIX).write_text(digest, encoding="ascii")
+    return hashed
+
+
+def is_hashed(name: str) -> bool:
+    return HASHED_NAME_RE.search(name.rsplit("/", 1)[-1]) is not None
+
+
+def asset_etag(path: Path) -> Optional[str]:
+    m = HASHED_NAME_RE.search(path.name)
+    if m:
+        return m.group(1)
+    # Unhashed files only get a content ETag if one was recorded at write time.
+    sidecar = path.with_name(path.name + DIGEST_SUFFIX)
+    try:
+        if sidecar.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+            return sidecar.read_text(encoding="ascii").strip()[:HASH_LEN] or None
+    except FileNotFoundError:
+        pass
+    return None
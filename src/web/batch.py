@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import json
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.config import ensure_output_dir
+from src.web.jobs import RENDERERS
+
+
+COPY_CHUNK = 256 * 1024
+
+
+@dataclass
+class BatchItem:
+    index: int
+    kind: str
+    params: Dict[str, str]
+
+    @property
+    def name(self) -> str:
+        return f"{self.index:03d}-{self.kind}"
+
+
+class _ZipSink:
+    # Write-only target for ZipFile; ZipFile sees no tell/seek and writes data descriptors.
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parse_items(specs: Sequence[Any], fields: Dict[str, Tuple[str, ...]]) -> List[BatchItem]:
+    items: List[BatchItem] = []
+    for i, spec in enumerate(specs):
+        if not isinstance(spec, dict) or spec.get("kind") not in fields:
+            raise ValueError(f"Item {i}: kind must be one of {', '.join(sorted(fields))}")
+        items.append(BatchItem(i, spec["kind"], {k: str(spec.get(k, "")) for k in fields[spec["kind"]]}))
+    return items
+
+
+def _render(item: BatchItem, work_dir: Path) -> Tuple[Path, Dict[str, Any]]:
+    return RENDERERS[item.kind](item.params, work_dir / item.name)
+
+
+def stream_zip(items: Sequence[BatchItem], workers: int = 2, executor: Optional[Executor] = None) -> Iterator[bytes]:
+    """Render ``items`` in parallel and yield a ZIP archive as each one finishes.
+
+    At most ``workers`` renders are in flight, on ``executor`` when given
+    (the web app passes the render queue's pool) or on a pool of our own.
+    Finished images are copied into the archive in chunks and deleted, so
+    memory stays bounded by one chunk regardless of batch size. Entries
+    appear in completion order and a final ``manifest.json`` records
+    per-item status.
+    """
+    work_dir = Path(tempfile.mkdtemp(prefix=".batch-", dir=ensure_output_dir()))
+    sink = _ZipSink()
+    zf = zipfile.ZipFile(sink, "w")
+    pool = executor or ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch")
+    pending: Dict[Future, BatchItem] = {}
+    queue = iter(items)
+    manifest: List[Dict[str, Any]] = []
+    try:
+        while True:
+            while len(pending) < max(1, workers):
+                item: Optional[BatchItem] = next(queue, None)
+                if item is None:
+                    break
+                pending[pool.submit(_render, item, work_dir)] = item
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                item = pending.pop(fut)
+                entry: Dict[str, Any] = {"index": item.index, "kind": item.kind, "params": item.params}
+                try:
+                    out, details = fut.result()
+                except Exception as e:
+                    entry.update(status="error", error=str(e) or type(e).__name__)
+                else:
+                    image_name = f"{item.name}{out.suffix}"
+                    # PNGs are already compressed; deflating them again only costs CPU.
+                    with out.open("rb") as src, zf.open(zipfile.ZipInfo(image_name), "w", force_zip64=True) as dst:
+                        for block in iter(lambda: src.read(COPY_CHUNK), b""):
+                            dst.write(block)
+                            yield sink.drain()
+                    zf.writestr(f"{item.name}.json", json.dumps(details, ensure_ascii=False, indent=2),
+                                compress_type=zipfile.ZIP_DEFLATED)
+                    entry.update(status="done", image=image_name, details=f"{item.name}.json")
+                finally:
+                    shutil.rmtree(work_dir / item.name, ignore_errors=True)
+                manifest.append(entry)
+                yield sink.drain()
+        manifest.sort(key=lambda e: e["index"])
+        zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2),
+                    compress_type=zipfile.ZIP_DEFLATED)
+        zf.close()
+        yield sink.drain()
+    finally:
+        # Also reached when the client disconnects mid-stream.
+        if executor is None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        else:
+            for fut in pending:
+                fut.cancel()
+            wait(pending)
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.config import config, ensure_output_dir
+from src.cover.generate import generate_cover, generate_tshirt_design
+from src.marketing.details import generate_book_cover_details, generate_tshirt_details
+from src.ocr.extract import ocr_image
+from src.web.assets import publish
+
+
+JOBS_DIR_NAME = "jobs"
+JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+@dataclass
+class RenderJob:
+    id: str
+    kind: str
+    status: str  # queued | running | done | error
+    params: Dict[str, str]
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    output: Optional[str] = None  # path relative to OUTPUT_DIR
+    details: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in {"done", "error"}
+
+
+def _render_cover(params: Dict[str, str], job_dir: Path) -> Tuple[Path, Dict[str, Any]]:
+    out = generate_cover(params.get("title", ""), params.get("author", ""), params.get("quote", ""), job_dir / "cover.png")
+    details = generate_book_cover_details(params.get("title", ""), params.get("author", ""), params.get("quote", ""))
+    return out, asdict(details)
+
+
+def _render_tshirt(params: Dict[str, str], job_dir: Path) -> Tuple[Path, Dict[str, Any]]:
+    out = generate_tshirt_design(text=params.get("text", ""), out_path=job_dir / "tshirt.png",
+                                 title=params.get("title") or None)
+    details = generate_tshirt_details(params.get("title", ""), params.get("author", ""), params.get("text", ""))
+    return out, asdict(details)
+
+
+def _run_ocr(params: Dict[str, str], job_dir: Path) -> Tuple[Path, Dict[str, Any]]:
+    # params come from the upload store, never from the client: path is relative to OUTPUT_DIR.
+    text = ocr_image(Path(ensure_output_dir()) / params["path"], file_hash=params.get("sha256") or None)
+    job_dir.mkdir(parents=True, exist_ok=True)
+    out = job_dir / "ocr.txt"
+    out.write_text(text, encoding="utf-8")
+    return out, {"text": text, "sha256": params.get("sha256")}
+
+
+RENDERERS: Dict[str, Callable[[Dict[str, str], Path], Tuple[Path, Dict[str, Any]]]] = {
+    "cover": _render_cover,
+    "tshirt": _render_tshirt,
+    "ocr": _run_ocr,
+}
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class RenderQueue:
+    """Background render pool with per-job output directories.
+
+    Job state lives in ``OUTPUT_DIR/jobs/<id>/job.json`` rather than in
+    memory, so any gunicorn worker can answer a status poll for a job that
+    another worker is rendering. Renders run on a thread pool: Pillow and
+    OpenCV release the GIL for the heavy parts (filters, PNG encode).
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 16, job_ttl: float = 0) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self._last_sweep = 0.0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def root(self) -> Path:
+        return Path(ensure_output_dir()) / JOBS_DIR_NAME
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Created lazily so a pool is never inherited across a gunicorn --preload fork.
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="render")
+        return self._executor
+
+    def _after_fork(self) -> None:
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def executor(self) -> ThreadPoolExecutor:
+        return self._pool()
+
+    def reserve(self, slots: int) -> Callable[[], None]:
+        """Count ``slots`` renders run directly on :meth:`executor` against ``max_pending``.
+
+        Raises :class:`QueueFull` like :meth:`submit`; returns a release
+        function that is safe to call more than once.
+        """
+        with self._lock:
+            if self._pending + slots > self.max_pending:
+                raise QueueFull("Render queue is full, try again shortly")
+            self._pending += slots
+        released = threading.Event()
+
+        def release() -> None:
+            with self._lock:
+                if not released.is_set():
+                    released.set()
+                    self._pending -= slots
+        return release
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.root / job_id
+
+    def save(self, job: RenderJob) -> None:
+        d = self.job_dir(job.id)
+        d.mkdir(parents=True, exist_ok=True)
+        tmp = d / "job.json.tmp"
+        tmp.write_text(json.dumps(asdict(job), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, d / "job.json")
+
+    def get(self, job_id: str) -> Optional[RenderJob]:
+        if not JOB_ID_RE.match(job_id):
+            return None
+        try:
+            data = json.loads((self.job_dir(job_id) / "job.json").read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return RenderJob(**data)
+
+    def submit(self, kind: str, params: Dict[str, str]) -> RenderJob:
+        if kind not in RENDERERS:
+            raise ValueError(f"Unknown render kind: {kind}")
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull("Render queue is full, try again shortly")
+            self._pending += 1
+        job = RenderJob(id=uuid.uuid4().hex, kind=kind, status="queued", params=dict(params), created_at=time.time())
+        try:
+            self.save(job)
+            self._pool().submit(self._run, job)
+        except BaseException:
+            # Disk full, permissions, pool shut down: give the slot back or the queue stays "full".
+            with self._lock:
+                self._pending -= 1
+            raise
+        if self.job_ttl and job.created_at - self._last_sweep > min(self.job_ttl, 600):
+            self._last_sweep = job.created_at
+            self._pool().submit(self.sweep)
+        return job
+
+    def sweep(self) -> int:
+        """Delete job directories older than ``job_ttl`` seconds; returns how many were removed.
+
+        Age counts from when the job finished, or from its creation for one
+        that never did (its worker died). Runs on the pool every few minutes
+        while jobs are being submitted.
+        """
+        cutoff = time.time() - self.job_ttl
+        removed = 0
+        try:
+            entries = list(self.root.iterdir())
+        except FileNotFoundError:
+            return 0
+        for d in entries:
+            if not JOB_ID_RE.match(d.name):
+                continue
+            job = self.get(d.name)
+            try:
+                stamp = (job.finished_at or job.created_at) if job else d.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if stamp < cutoff:
+                shutil.rmtree(d, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def _run(self, job: RenderJob) -> None:
+        try:
+            job.status, job.started_at = "running", time.time()
+            self.save(job)
+            out, details = RENDERERS[job.kind](job.params, self.job_dir(job.id))
+            out = publish(out)
+            job.output = out.relative_to(Path(ensure_output_dir())).as_posix()
+            job.details = details
+            job.status = "done"
+        except Exception as e:
+            job.status, job.error = "error", str(e) or type(e).__name__
+        finally:
+            job.finished_at = time.time()
+            self.save(job)
+            with self._lock:
+                self._pending -= 1
+
+
+render_queue = RenderQueue(workers=config.render_workers, max_pending=config.render_max_pending,
+                           job_ttl=config.render_job_ttl)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from io import BytesIO
+from typing import Dict, Tuple
+
+from src.cover.generate import draw_cover, draw_tshirt_design
+from src.tracking.progress import timed
+from src.utils.cache import memoize
+
+
+# Default preview scale per kind: both land around 450-560 px wide.
+PREVIEW_SCALES: Dict[str, float] = {"cover": 0.25, "tshirt": 0.125}
+MIN_SCALE, MAX_SCALE = 0.05, 0.5
+WEBP_QUALITY = 80
+
+
+def preview_key(kind: str, params: Dict[str, str], scale: float) -> str:
+    blob = json.dumps([kind, params, scale], sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return f"preview:{hashlib.sha256(blob).hexdigest()}"
+
+
+@timed("render", "preview")
+def _encode_preview(kind: str, params: Dict[str, str], scale: float) -> bytes:
+    if kind == "cover":
+        img = draw_cover(params.get("title", ""), params.get("author", ""), params.get("quote", ""), scale=scale)
+    else:
+        img = draw_tshirt_design(params.get("text", ""), title=params.get("title") or None, scale=scale)
+    buf = BytesIO()
+    # method=0 is the fastest WebP encoder setting; plenty for a throwaway preview.
+    img.save(buf, "WEBP", quality=WEBP_QUALITY, method=0)
+    return buf.getvalue()
+
+
+def render_preview(kind: str, params: Dict[str, str], scale: float | None = None) -> Tuple[str, bytes]:
+    """Return ``(etag, webp_bytes)`` for a reduced-scale render; repeated layouts come from the render cache."""
+    scale = min(MAX_SCALE, max(MIN_SCALE, scale or PREVIEW_SCALES[kind]))
+    key = preview_key(kind, params, scale)
+    return key.split(":", 1)[1][:16], memoize(key, lambda: _encode_preview(kind, params, scale), namespace="render")
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from werkzeug.utils import secure_filename
+
+from src.config import ensure_output_dir
+
+
+UPLOADS_DIR_NAME = "uploads"
+CHUNK_SIZE = 1024 * 1024
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg"}
+
+
+@dataclass
+class StoredUpload:
+    sha256: str
+    path: Path  # relative to OUTPUT_DIR
+    size: int
+    created: bool  # False when an identical file was already stored
+
+
+def uploads_root() -> Path:
+    return Path(ensure_output_dir()) / UPLOADS_DIR_NAME
+
+
+def _suffix(filename: str) -> str:
+    suffix = Path(secure_filename(filename or "")).suffix.lower()
+    return suffix if 1 < len(suffix) <= 10 else ""
+
+
+def store_stream(stream: BinaryIO, filename: str) -> StoredUpload:
+    """Copy ``stream`` to disk in chunks while hashing it, then file it by content.
+
+    The body never sits in memory and the client-supplied name only
+    contributes its extension; the file lands at
+    ``uploads/<sha[:2]>/<sha><ext>``, so re-uploading identical bytes finds
+    the existing file and discards the temp copy.
+    """
+    root = uploads_root()
+    root.mkdir(parents=True, exist_ok=True)
+    h = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=root, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        digest = h.hexdigest()
+        dest = root / digest[:2] / f"{digest}{_suffix(filename)}"
+        created = not dest.exists()
+        if created:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, dest)
+        else:
+            os.unlink(tmp)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return StoredUpload(sha256=digest, path=dest.relative_to(Path(ensure_output_dir())), size=size, created=created)
+
+
+def is_image(upload: StoredUpload) -> bool:
+    return upload.path.suffix in IMAGE_SUFFIXES
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from flask import Flask
+from PIL import Image
+
+from src.cover.generate import draw_cover, draw_tshirt_design, warm_up as warm_up_cover
+from src.web.preview import PREVIEW_SCALES
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WarmupState:
+    mode: str = "off"
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    pid: Optional[int] = None  # process that ran the warm-up; differs from os.getpid() after a --preload fork
+    error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.mode == "off" or self.finished_at is not None
+
+    def as_dict(self) -> Dict[str, Any]:
+        took = None
+        if self.started_at is not None and self.finished_at is not None:
+            took = round(self.finished_at - self.started_at, 3)
+        return {"ready": self.ready, "mode": self.mode, "seconds": took, "error": self.error,
+                "warmed_in": self.pid, "pid": os.getpid(), "preloaded": self.pid not in (None, os.getpid())}
+
+
+def _warm(app: Flask, state: WarmupState) -> None:
+    state.started_at, state.pid = time.time(), os.getpid()
+    try:
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+        Image.init()  # registers every codec plugin (PNG, WebP) up front
+        warm_up_cover(scales=(1.0, *sorted(set(PREVIEW_SCALES.values()))))
+        # A throwaway render pulls in whatever the layout code still loads lazily.
+        draw_cover("Warm", "Up", "warm up", scale=PREVIEW_SCALES["cover"])
+        draw_tshirt_design("warm up", title="Warm", scale=PREVIEW_SCALES["tshirt"])
+    except Exception as e:  # a failed warm-up only costs speed, never availability
+        state.error = str(e) or type(e).__name__
+        logger.warning("Warm-up failed: %s", state.error)
+    finally:
+        state.finished_at = time.time()
+
+
+def warm_up(app: Flask, mode: str = "sync") -> WarmupState:
+    """Preload templates, fonts and background layers for ``app``.
+
+    ``sync`` blocks until done; under ``gunicorn --preload`` this runs once in
+    the master and the warmed objects are shared copy-on-write by every
+    worker (``gc.freeze`` keeps the collector from touching and so copying
+    them). ``background`` returns immediately and warms on a thread, for
+    servers without preload; ``/ready`` answers 503 until it finishes.
+    """
+    state = WarmupState(mode=mode)
+    if mode == "sync":
+        _warm(app, state)
+        gc.freeze()
+    elif mode == "background":
+        threading.Thread(target=_warm, args=(app, state), name="warmup", daemon=True).start()
+    return state
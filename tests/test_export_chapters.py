@@ -0,0 +1,22 @@
+from pathlib import Path
+
+from src.export.format import iter_chapters
+
+
+def _titles(tmp_path: Path, text: str):
+    src = tmp_path / "book.txt"
+    src.write_text(text, encoding="utf-8")
+    return [(c.title, len(c.paragraphs)) for c in iter_chapters(src, default_title="Book")]
+
+
+def test_headings_split_chapters(tmp_path: Path) -> None:
+    text = "# Opening\n\nFirst.\n\nChapter 2\n\nSecond.\n\nPart IV: The Return\n\nThird.\n"
+    assert _titles(tmp_path, text) == [("Opening", 1), ("Chapter 2", 1), ("Part IV: The Return", 1)]
+
+
+def test_prose_starting_with_part_is_not_a_heading(tmp_path: Path) -> None:
+    text = ("Chapter 1\n\n"
+            "Part civil servant and part poet, she kept two diaries\n\n"
+            "part I loved most of all\n\n"
+            "Part IV of the plan\nwent wrong from the start.\n")
+    assert _titles(tmp_path, text) == [("Chapter 1", 3)]